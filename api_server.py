@@ -1,13 +1,50 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, File, Form, HTTPException, Response, UploadFile
 from pydantic import BaseModel
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from client import helix
+from contextlib import asynccontextmanager
+from dedup import DedupIndex
+from ingest_queue import IngestWorkers, JobQueue
+from paths import BASE_DIR
+from telemetry import new_trace, span
+import file_helper
+import media_helper
+import asyncio
 import logging
+import os
+import shutil
+import uuid
 from pathlib import Path
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Search Agent API")
+job_queue = JobQueue()
+ingest_workers = IngestWorkers(
+    job_queue,
+    url_workers=int(os.getenv("INGEST_URL_WORKERS", "4")),
+    file_workers=int(os.getenv("INGEST_FILE_WORKERS", "2")),
+    media_workers=int(os.getenv("INGEST_MEDIA_WORKERS", "2")),
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    ingest_workers.start()
+    yield
+    await ingest_workers.stop()
+
+app = FastAPI(title="Search Agent API", lifespan=lifespan)
+
+# Optional cap on concurrent searches (unset or 0: unlimited). Each search spawns
+# three MCP server processes, so a cap bounds process count and memory under bursts;
+# time spent waiting for a slot is reported as the "queue" stage.
+MAX_CONCURRENT_SEARCHES = int(os.getenv("MAX_CONCURRENT_SEARCHES", "0"))
+search_slots = asyncio.Semaphore(MAX_CONCURRENT_SEARCHES) if MAX_CONCURRENT_SEARCHES > 0 else None
+
+def validate_user_id(user_id: str) -> None:
+    """Reject user ids that would resolve outside uploads/<user_id> (e.g. '..' or 'a/b')."""
+    if not user_id or (BASE_DIR / user_id).resolve().parent != BASE_DIR.resolve():
+        raise HTTPException(status_code=400, detail=f"Invalid user_id '{user_id}'")
 
 def ensure_user_directories(user_id: str) -> None:
     """
@@ -17,12 +54,12 @@ def ensure_user_directories(user_id: str) -> None:
     Args:
         user_id: Unique identifier for the user
     """
-    base_path = Path(__file__).parent / "uploads" / user_id / "processed"
+    base_path = BASE_DIR / user_id / "processed"
     
     for subdirectory in ["links", "docs", "media"]:
         dir_path = base_path / subdirectory
         dir_path.mkdir(parents=True, exist_ok=True)
-        logger.info(f"Ensured directory exists: {dir_path}")
+        logger.debug(f"Ensured directory exists: {dir_path}")
 
 class SearchRequest(BaseModel):
     user_id: str
@@ -35,10 +72,20 @@ class SearchResponse(BaseModel):
 
 @app.post("/search", response_model=SearchResponse)
 async def search(request: SearchRequest):
+    validate_user_id(request.user_id)
+    trace_id = new_trace()
     try:
-        logger.info(f"Received search request from user: {request.user_id}")
-        ensure_user_directories(request.user_id)
-        result = await helix(request.user_id, request.query)
+        logger.info(f"Received search request from user: {request.user_id} (trace {trace_id})")
+        with span("request", user_id=request.user_id):
+            with span("queue"):
+                if search_slots is not None:
+                    await search_slots.acquire()
+            try:
+                ensure_user_directories(request.user_id)
+                result = await helix(request.user_id, request.query)
+            finally:
+                if search_slots is not None:
+                    search_slots.release()
         return SearchResponse(
             user_id=request.user_id,
             query=request.query,
@@ -48,6 +95,119 @@ async def search(request: SearchRequest):
         logger.error(f"Error processing request for user {request.user_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+class IngestUrlRequest(BaseModel):
+    user_id: str
+    url: str
+    priority: int = 0
+
+class IngestResponse(BaseModel):
+    job_id: int
+    status: str
+
+class JobStatusResponse(BaseModel):
+    job_id: int
+    user_id: str
+    kind: str
+    status: str
+    priority: int
+    attempts: int
+    error: str | None
+    output_path: str | None
+
+def save_upload(user_id: str, upload: UploadFile, allowed_extensions: set[str]) -> Path:
+    """
+    Stream an uploaded file to uploads/<user_id>/raw/<upload id>-<filename>.
+
+    The original is deleted once its ingestion job finishes (done, duplicate or failed).
+
+    Args:
+        user_id: Unique identifier for the user
+        upload: The uploaded file
+        allowed_extensions: Accepted extensions (lowercase, without leading dots)
+
+    Returns:
+        Path of the stored original
+    """
+    filename = Path(upload.filename or "upload").name
+    ext = Path(filename).suffix.lower().lstrip(".")
+    if ext not in allowed_extensions:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported file type '.{ext}'. Supported: {', '.join(sorted(allowed_extensions))}"
+        )
+    raw_dir = BASE_DIR / user_id / "raw"
+    raw_dir.mkdir(parents=True, exist_ok=True)
+    path = raw_dir / f"{uuid.uuid4().hex[:12]}-{filename}"
+    with open(path, "wb") as f:
+        shutil.copyfileobj(upload.file, f)
+    return path
+
+def enqueue_job(user_id: str, kind: str, source: str, priority: int) -> IngestResponse:
+    ensure_user_directories(user_id)
+    job_id = job_queue.enqueue(user_id, kind, source, priority=priority)
+    logger.info(f"Enqueued {kind} ingestion job {job_id} for user: {user_id}")
+    return IngestResponse(job_id=job_id, status="queued")
+
+async def submit_job(user_id: str, kind: str, source: str, priority: int) -> IngestResponse:
+    response = await asyncio.to_thread(enqueue_job, user_id, kind, source, priority)
+    # Woken from the event loop thread: asyncio.Event is not thread-safe
+    ingest_workers.notify(kind)
+    return response
+
+@app.post("/ingest/url", response_model=IngestResponse)
+async def ingest_url(request: IngestUrlRequest):
+    validate_user_id(request.user_id)
+    return await submit_job(request.user_id, "url", request.url, request.priority)
+
+@app.post("/ingest/file", response_model=IngestResponse)
+async def ingest_file(user_id: str = Form(...), priority: int = Form(0), file: UploadFile = File(...)):
+    validate_user_id(user_id)
+    path = await asyncio.to_thread(save_upload, user_id, file, file_helper.ALLOWED_EXTENSIONS)
+    return await submit_job(user_id, "file", str(path), priority)
+
+@app.post("/ingest/media", response_model=IngestResponse)
+async def ingest_media(user_id: str = Form(...), priority: int = Form(0), file: UploadFile = File(...)):
+    validate_user_id(user_id)
+    path = await asyncio.to_thread(save_upload, user_id, file, media_helper.ALLOWED_EXTENSIONS)
+    return await submit_job(user_id, "media", str(path), priority)
+
+@app.get("/ingest/{job_id}", response_model=JobStatusResponse)
+async def ingest_status(job_id: int):
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return JobStatusResponse(job_id=job["id"], **{k: job[k] for k in JobStatusResponse.model_fields if k != "job_id"})
+
+class DuplicateEntry(BaseModel):
+    path: str
+    source: str | None
+    similarity: float
+
+class DuplicateCluster(BaseModel):
+    canonical: str
+    source: str | None
+    duplicates: list[DuplicateEntry]
+
+class DuplicatesResponse(BaseModel):
+    user_id: str
+    clusters: list[DuplicateCluster]
+
+def list_duplicate_clusters(user_id: str) -> list[dict]:
+    if not (BASE_DIR / user_id / "dedup.sqlite3").exists():
+        return []
+    with DedupIndex(user_id) as index:
+        return index.clusters()
+
+@app.get("/users/{user_id}/duplicates", response_model=DuplicatesResponse)
+async def duplicates(user_id: str):
+    validate_user_id(user_id)
+    clusters = await asyncio.to_thread(list_duplicate_clusters, user_id)
+    return DuplicatesResponse(user_id=user_id, clusters=clusters)
+
+@app.get("/metrics")
+async def metrics():
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 @app.get("/health")
 async def health_check():
     return {"status": "good"}
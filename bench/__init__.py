@@ -0,0 +1 @@
+"""Offline benchmark harness: stand-in API servers, synthetic corpora and load generation."""
@@ -0,0 +1,108 @@
+"""
+Synthetic user corpora for benchmarking.
+
+Writes markdown shaped like the converters' output into
+uploads/<prefix>-<n>/processed/{links,docs,media}/ so the MCP tools have
+something realistic to list, grep and read.
+
+Usage:
+  python -m bench.corpus --users 4 --files 200 --file-kb 8
+"""
+import argparse
+import random
+import shutil
+
+from paths import BASE_DIR
+
+# Words the load generator also draws its queries from, so grep has real hits.
+VOCABULARY = [
+    "agent", "latency", "python", "database", "index", "search", "model", "transformer",
+    "kubernetes", "cache", "embedding", "pipeline", "benchmark", "throughput", "queue",
+    "vector", "token", "compiler", "network", "storage", "memory", "scheduler", "startup",
+    "funding", "research", "study", "project", "market", "design", "review", "release",
+]
+
+
+def _sentence(rng: random.Random, words: int = 14) -> str:
+    return " ".join(rng.choice(VOCABULARY) for _ in range(words)).capitalize() + "."
+
+
+def _links_doc(rng: random.Random, size: int) -> str:
+    parts = [f"# {_sentence(rng, 5)}\n", f"**URL:** https://example.com/{rng.randrange(10**6)}\n", "---\n"]
+    length = sum(len(p) for p in parts)
+    while length < size:
+        if rng.random() < 0.15:
+            parts.append(f"## {_sentence(rng, 4)}\n")
+        parts.append(_sentence(rng) + "\n")
+        length += len(parts[-1])
+    return "\n".join(parts)
+
+
+def _docs_doc(rng: random.Random, size: int) -> str:
+    parts = [f"# {_sentence(rng, 6)}\n"]
+    length, section = 0, 0
+    while length < size:
+        if rng.random() < 0.1:
+            section += 1
+            parts.append(f"## {section}. {_sentence(rng, 4)}\n")
+        parts.append(" ".join(_sentence(rng) for _ in range(3)) + "\n")
+        length += len(parts[-1])
+    return "\n".join(parts)
+
+
+def _media_doc(rng: random.Random, size: int) -> str:
+    parts = [f"# YouTube Transcript: {rng.randrange(10**8):08x}\n", "---\n", "## Transcript\n"]
+    length, seconds = 0, 0
+    while length < size:
+        seconds += rng.randint(2, 8)
+        parts.append(f"**[{seconds // 60:02d}:{seconds % 60:02d}]** {_sentence(rng, 10)}\n")
+        length += len(parts[-1])
+    return "\n".join(parts)
+
+
+GENERATORS = {"links": _links_doc, "docs": _docs_doc, "media": _media_doc}
+
+
+def generate_corpus(users: int, files: int, file_kb: int, prefix: str = "bench-user", seed: int = 0) -> list[str]:
+    """
+    Generate a synthetic corpus for each benchmark user.
+
+    Existing directories for the generated user ids are replaced.
+
+    Args:
+        users: Number of users to generate
+        files: Number of files per subdirectory per user
+        file_kb: Approximate size of each file in KiB
+        prefix: User id prefix
+        seed: Random seed for reproducible corpora
+
+    Returns:
+        The generated user ids
+    """
+    rng = random.Random(seed)
+    user_ids = []
+    for n in range(users):
+        user_id = f"{prefix}-{n}"
+        user_root = BASE_DIR / user_id
+        if user_root.exists():
+            shutil.rmtree(user_root)
+        for subdirectory, generate in GENERATORS.items():
+            target = user_root / "processed" / subdirectory
+            target.mkdir(parents=True, exist_ok=True)
+            for i in range(files):
+                (target / f"{subdirectory}-{i:05d}.md").write_text(generate(rng, file_kb * 1024), encoding="utf-8")
+        user_ids.append(user_id)
+    return user_ids
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic benchmark corpora under uploads/")
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--files", type=int, default=200, help="Files per subdirectory per user")
+    parser.add_argument("--file-kb", type=int, default=8)
+    parser.add_argument("--prefix", default="bench-user")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    ids = generate_corpus(args.users, args.files, args.file_kb, args.prefix, args.seed)
+    print(f"Generated corpora for {len(ids)} users under {BASE_DIR}")
@@ -0,0 +1,102 @@
+"""
+Import-time budget check for helix entry points.
+
+Imports each module in a fresh interpreter several times, takes the median
+import time and fails if any module exceeds its budget or eagerly loads a
+dependency it should only import on first use.
+
+Usage:
+  python -m bench.import_time [--runs 5] [--scale 1.5] [--json import_time.json]
+
+--scale multiplies every budget, for slower machines.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# module -> import-time budget in milliseconds (median of fresh interpreters)
+BUDGETS_MS = {
+    "api_server": 1000,
+    "mcp_server": 1400,
+    "client": 250,
+    "ingest_queue": 250,
+    "process_url": 50,
+    "file_helper": 50,
+    "media_helper": 100,
+}
+
+# Heavy dependencies that must stay unloaded after importing any entry point
+DEFERRED_MODULES = [
+    "openai",
+    "cerebras",
+    "markitdown",
+    "bs4",
+    "markdownify",
+    "github",
+    "youtube_transcript_api",
+    "readability",
+    "trafilatura",
+    "requests",
+    "zstandard",
+]
+
+# mcp is the server itself for mcp_server.py; every other entry point must defer it.
+# httpx (imported by mcp) loads zstandard for response decoding when it is installed.
+DEFERRED_EXCEPT = {"mcp_server": {"mcp", "zstandard"}}
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"ms": elapsed * 1000, "modules": sorted({{m.split('.')[0] for m in sys.modules}})}}))
+"""
+
+
+def measure(module: str, runs: int) -> tuple[float, list[str]]:
+    """Return the median import time in ms and the top-level packages loaded."""
+    timings = []
+    loaded: list[str] = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(module=module)],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        timings.append(result["ms"])
+        loaded = result["modules"]
+    return statistics.median(timings), loaded
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check helix import times against budgets")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply all budgets")
+    parser.add_argument("--json", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = {}
+    failed = False
+    for module, budget in BUDGETS_MS.items():
+        ms, loaded = measure(module, args.runs)
+        allowed = DEFERRED_EXCEPT.get(module, set())
+        eager = [m for m in DEFERRED_MODULES + ["mcp"] if m in loaded and m not in allowed]
+        over = ms > budget * args.scale
+        failed = failed or over or bool(eager)
+        results[module] = {"ms": round(ms, 1), "budget_ms": budget * args.scale, "eager_imports": eager}
+        status = "FAIL" if over or eager else "ok"
+        note = f" eager: {', '.join(eager)}" if eager else ""
+        print(f"{status:<4} {module:<14} {ms:8.1f} ms (budget {budget * args.scale:.0f} ms){note}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""
+Offline end-to-end benchmark for helix.
+
+Generates a synthetic corpus, starts the stand-in API servers (bench.stubs) and
+the real api_server with every external endpoint pointed at them, drives load
+against /search and reports latency percentiles, throughput, the per-stage
+breakdown scraped from /metrics and peak RSS.
+
+Usage:
+  python -m bench.run --scenario steady
+  python -m bench.run --scenario burst --users 8 --files 500 --json bench.json
+  python -m bench.run --helpers 20
+  python -m bench.run --scenario steady --storage segments
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+from prometheus_client.parser import text_string_to_metric_families
+
+from bench.corpus import VOCABULARY, generate_corpus
+from segment_store import migrate
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# name -> (concurrency, total requests)
+SCENARIOS = {
+    "smoke": (1, 5),
+    "steady": (8, 200),
+    "burst": (64, 256),
+}
+
+
+def stub_env(stub_url: str) -> dict[str, str]:
+    """Environment that points every external API used by helix at the stubs."""
+    return {
+        "OPENROUTER_BASE_URL": f"{stub_url}/openrouter/v1",
+        "OPENROUTER_API_KEY": "bench",
+        "CEREBRAS_BASE_URL": f"{stub_url}/cerebras",
+        "CEREBRAS_API_KEY": "bench",
+        "OPENAI_BASE_URL": f"{stub_url}/openai/v1",
+        "OPENAI_API_KEY": "bench",
+        "GITHUB_API_URL": f"{stub_url}/github",
+        "MODEL": "bench-model",
+        "LINKS_AGENT_PROMPT": "Search the user's saved links.",
+        "DOCS_AGENT_PROMPT": "Search the user's documents.",
+        "MEDIA_AGENT_PROMPT": "Search the user's media transcripts.",
+        "SYNTHESIS_AGENT_PROMPT": "Summarize the search results.",
+    }
+
+
+def percentile(values: list[float], pct: int) -> float:
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[pct - 1]
+
+
+def peak_child_rss_mb() -> float:
+    """Largest max-RSS among child processes that have been waited for."""
+    rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def stage_breakdown(metrics_text: str) -> dict[str, dict]:
+    """Aggregate helix_stage_duration_seconds across agents into count/mean/p95 per stage."""
+    counts: dict[str, float] = {}
+    sums: dict[str, float] = {}
+    buckets: dict[str, dict[float, float]] = {}
+    for family in text_string_to_metric_families(metrics_text):
+        if family.name != "helix_stage_duration_seconds":
+            continue
+        for sample in family.samples:
+            stage = sample.labels.get("stage")
+            if sample.name.endswith("_count"):
+                counts[stage] = counts.get(stage, 0) + sample.value
+            elif sample.name.endswith("_sum"):
+                sums[stage] = sums.get(stage, 0) + sample.value
+            elif sample.name.endswith("_bucket"):
+                le = float(sample.labels["le"])
+                stage_buckets = buckets.setdefault(stage, {})
+                stage_buckets[le] = stage_buckets.get(le, 0) + sample.value
+
+    breakdown = {}
+    for stage, count in counts.items():
+        if not count:
+            continue
+        p95 = next((le for le, n in sorted(buckets[stage].items()) if n >= 0.95 * count), float("inf"))
+        breakdown[stage] = {
+            "count": int(count),
+            "mean_ms": round(sums[stage] / count * 1000, 2),
+            "p95_le_ms": round(p95 * 1000, 2),
+        }
+    return breakdown
+
+
+def wait_for(url: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Timed out waiting for {url}")
+
+
+async def drive_load(api_url: str, user_ids: list[str], concurrency: int, total: int, seed: int) -> tuple[list[float], int, float]:
+    """
+    Send `total` /search requests with at most `concurrency` in flight.
+
+    Returns:
+        (latencies in seconds of successful requests, error count, wall time in seconds)
+    """
+    rng = random.Random(seed)
+    requests_to_send = [
+        {"user_id": rng.choice(user_ids), "query": " ".join(rng.sample(VOCABULARY, 3))}
+        for _ in range(total)
+    ]
+    latencies: list[float] = []
+    errors = 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for body in requests_to_send:
+        queue.put_nowait(body)
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        nonlocal errors
+        while True:
+            try:
+                body = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            try:
+                response = await client.post(f"{api_url}/search", json=body)
+                if response.status_code == 200:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+
+    started = time.perf_counter()
+    async with httpx.AsyncClient(timeout=600) as client:
+        await asyncio.gather(*[worker(client) for _ in range(concurrency)])
+    return latencies, errors, time.perf_counter() - started
+
+
+def run_helpers(iterations: int) -> dict[str, dict]:
+    """Time the URL and media helpers in-process against the stubs."""
+    from process_url import url_to_markdown
+    from media_helper import transcribe_media
+
+    timings: dict[str, list[float]] = {"github_url": [], "transcribe_media": []}
+    with tempfile.NamedTemporaryFile(suffix=".mp3") as media:
+        media.write(os.urandom(256 * 1024))
+        media.flush()
+        for _ in range(iterations):
+            start = time.perf_counter()
+            url_to_markdown("https://github.com/bench/repo")
+            timings["github_url"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            transcribe_media(media.name)
+            timings["transcribe_media"].append(time.perf_counter() - start)
+
+    return {
+        name: {
+            "p50_ms": round(percentile(values, 50) * 1000, 2),
+            "p95_ms": round(percentile(values, 95) * 1000, 2),
+        }
+        for name, values in timings.items()
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark for helix")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="smoke")
+    parser.add_argument("--concurrency", type=int, help="Override the scenario's concurrency")
+    parser.add_argument("--requests", type=int, help="Override the scenario's request count")
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--files", type=int, default=200, help="Corpus files per subdirectory per user")
+    parser.add_argument("--file-kb", type=int, default=8)
+    parser.add_argument("--skip-corpus", action="store_true", help="Reuse an existing corpus")
+    parser.add_argument("--storage", choices=["files", "segments"], default="files",
+                        help="Storage backend; 'segments' packs the generated corpus before the run")
+    parser.add_argument("--script", help="Stub script JSON (latencies, tool-call plan)")
+    parser.add_argument("--latency-scale", type=float, default=1.0)
+    parser.add_argument("--stub-port", type=int, default=9100)
+    parser.add_argument("--api-port", type=int, default=9101)
+    parser.add_argument("--helpers", type=int, default=0, help="Also time process_url/media_helper N times")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write the report as JSON to this path")
+    args = parser.parse_args()
+
+    concurrency, total = SCENARIOS[args.scenario]
+    concurrency = args.concurrency or concurrency
+    total = args.requests or total
+
+    user_ids = [f"bench-user-{n}" for n in range(args.users)]
+    if not args.skip_corpus:
+        generate_corpus(args.users, args.files, args.file_kb, seed=args.seed)
+        if args.storage == "segments":
+            for user_id in user_ids:
+                if not migrate(user_id, delete=True):
+                    raise RuntimeError(f"No documents migrated for {user_id}")
+
+    stub_url = f"http://127.0.0.1:{args.stub_port}"
+    api_url = f"http://127.0.0.1:{args.api_port}"
+    env = {**os.environ, **stub_env(stub_url), "STORAGE_BACKEND": args.storage}
+
+    stub_cmd = [sys.executable, "-m", "bench.stubs", "--port", str(args.stub_port),
+                "--latency-scale", str(args.latency_scale)]
+    if args.script:
+        stub_cmd += ["--script", args.script]
+    stubs = subprocess.Popen(stub_cmd, cwd=ROOT, env=env)
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api_server:app", "--port", str(args.api_port), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+    try:
+        wait_for(f"{stub_url}/health")
+        wait_for(f"{api_url}/health")
+
+        latencies, errors, wall = asyncio.run(drive_load(api_url, user_ids, concurrency, total, args.seed))
+        stages = stage_breakdown(httpx.get(f"{api_url}/metrics", timeout=10).text)
+
+        helpers = {}
+        if args.helpers:
+            os.environ.update(stub_env(stub_url))
+            helpers = run_helpers(args.helpers)
+    finally:
+        api.terminate()
+        api.wait()
+        # Measured before the stubs exit so only the API server tree is counted
+        peak_rss = peak_child_rss_mb()
+        stubs.terminate()
+        stubs.wait()
+
+    report = {
+        "scenario": args.scenario,
+        "storage": args.storage,
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "requests_per_sec": round(len(latencies) / wall, 2) if wall else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p95": round(percentile(latencies, 95) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+        },
+        "stages": stages,
+        "peak_rss_mb": round(peak_rss, 1),
+        "helpers": helpers,
+    }
+
+    print(f"scenario={report['scenario']} storage={args.storage} concurrency={concurrency} requests={total} errors={errors}")
+    print(f"throughput: {report['requests_per_sec']} req/s")
+    print("latency: " + "  ".join(f"{k}={v}ms" for k, v in report["latency_ms"].items()))
+    print(f"peak RSS (largest server-side process): {report['peak_rss_mb']} MiB")
+    print("stages:")
+    for stage, stats in sorted(stages.items(), key=lambda kv: -kv[1]["mean_ms"]):
+        print(f"  {stage:<14} n={stats['count']:<6} mean={stats['mean_ms']}ms p95<={stats['p95_le_ms']}ms")
+    for name, stats in helpers.items():
+        print(f"helper {name}: p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Local stand-ins for the external APIs used by helix.
+
+One FastAPI app serves:
+  - /openrouter/v1/chat/completions  (agent LLM, follows a scripted tool-call plan)
+  - /cerebras/v1/chat/completions    (synthesis LLM)
+  - /openai/v1/chat/completions      (generic chat completions)
+  - /openai/v1/audio/transcriptions  (media transcription)
+  - /github/repos/...                (the subset of the GitHub REST API used by process_url)
+
+Point the SDKs at it with:
+  OPENROUTER_BASE_URL=http://127.0.0.1:<port>/openrouter/v1
+  CEREBRAS_BASE_URL=http://127.0.0.1:<port>/cerebras
+  OPENAI_BASE_URL=http://127.0.0.1:<port>/openai/v1
+  GITHUB_API_URL=http://127.0.0.1:<port>/github
+
+Usage:
+  python -m bench.stubs --port 9100 [--script script.json] [--latency-scale 0.5]
+"""
+import argparse
+import asyncio
+import base64
+import json
+import random
+import re
+import time
+import uuid
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+
+# Default behaviour; a JSON script file passed with --script is merged on top.
+#
+# tool_calls is the agent plan: entry N is the list of tool calls returned on the
+# model's Nth turn. Once the plan is exhausted the model returns final_answer.
+# "{query_word}" in tool arguments is replaced by the longest word of the user query.
+DEFAULT_SCRIPT = {
+    "latency_ms": {"openrouter": 400, "cerebras": 250, "openai": 800, "github": 80},
+    "jitter_ms": 50,
+    "tool_calls": [
+        [{"name": "list_file", "arguments": {}}],
+        [{"name": "grep", "arguments": {"pattern": "{query_word}"}}],
+    ],
+    "final_answer": "Found several notes matching the query in the saved content.",
+    "transcript": "This is a stand-in transcript produced by the benchmark server. " * 20,
+    "readme": "# Bench repository\n\nA synthetic repository served by the benchmark stubs.\n",
+}
+
+config: dict = json.loads(json.dumps(DEFAULT_SCRIPT))
+
+app = FastAPI(title="helix benchmark stubs")
+
+
+def load_script(path: str | None, latency_scale: float = 1.0) -> None:
+    """Merge a JSON script file into the active config and scale latencies."""
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            config.update(json.load(f))
+    config["latency_ms"] = {k: v * latency_scale for k, v in config["latency_ms"].items()}
+    config["jitter_ms"] = config["jitter_ms"] * latency_scale
+
+
+async def _simulate_latency(api: str) -> None:
+    base = config["latency_ms"].get(api, 0)
+    jitter = config.get("jitter_ms", 0)
+    delay = max(0.0, base + random.uniform(-jitter, jitter)) / 1000
+    if delay:
+        await asyncio.sleep(delay)
+
+
+def _count_tokens(messages: list[dict]) -> int:
+    """Rough token estimate (4 characters per token)."""
+    chars = sum(len(m.get("content") or "") for m in messages if isinstance(m.get("content"), str))
+    return max(1, chars // 4)
+
+
+def _query_word(messages: list[dict]) -> str:
+    for m in messages:
+        if m.get("role") == "user" and isinstance(m.get("content"), str):
+            words = re.findall(r"\w+", m["content"])
+            if words:
+                return re.escape(max(words, key=len))
+    return "the"
+
+
+def _completion(model: str, messages: list[dict], content: str | None, tool_calls: list | None) -> dict:
+    completion_tokens = max(1, len(content or "") // 4) + 20 * len(tool_calls or [])
+    prompt_tokens = _count_tokens(messages)
+    message = {"role": "assistant", "content": content}
+    if tool_calls:
+        message["tool_calls"] = tool_calls
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "finish_reason": "tool_calls" if tool_calls else "stop",
+            "message": message,
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+@app.post("/{provider}/v1/chat/completions")
+async def chat_completions(provider: str, request: Request):
+    if provider not in ("openrouter", "cerebras", "openai"):
+        raise HTTPException(status_code=404, detail=f"Unknown provider '{provider}'")
+    body = await request.json()
+    messages = body.get("messages", [])
+    await _simulate_latency(provider)
+
+    plan = config["tool_calls"] if provider == "openrouter" else []
+    turn = sum(1 for m in messages if m.get("role") == "assistant")
+    if turn < len(plan):
+        word = _query_word(messages)
+        tool_calls = [
+            {
+                "id": f"call_{uuid.uuid4().hex[:12]}",
+                "type": "function",
+                "function": {
+                    "name": call["name"],
+                    "arguments": json.dumps(call.get("arguments", {})).replace("{query_word}", word),
+                },
+            }
+            for call in plan[turn]
+        ]
+        return _completion(body.get("model", ""), messages, None, tool_calls)
+
+    return _completion(body.get("model", ""), messages, config["final_answer"], None)
+
+
+@app.post("/openai/v1/audio/transcriptions")
+async def transcriptions(request: Request):
+    # The multipart upload is drained but not parsed; only its size matters here.
+    await request.body()
+    await _simulate_latency("openai")
+    return PlainTextResponse(config["transcript"])
+
+
+def _repo_tree() -> dict[str, list[tuple[str, str]]]:
+    """Synthetic repository layout: directory path -> [(name, type)]."""
+    return {
+        "": [("README.md", "file"), ("pyproject.toml", "file"), ("src", "dir"), ("docs", "dir")],
+        "src": [("__init__.py", "file"), ("core", "dir"), ("cli.py", "file")],
+        "src/core": [("engine.py", "file"), ("utils", "dir")],
+        "src/core/utils": [("io.py", "file")],
+        "docs": [("index.md", "file"), ("guide.md", "file")],
+    }
+
+
+@app.get("/github/repos/{owner}/{repo}")
+async def github_repo(owner: str, repo: str, request: Request):
+    await _simulate_latency("github")
+    base = str(request.base_url).rstrip("/") + "/github"
+    return {
+        "id": 1,
+        "name": repo,
+        "full_name": f"{owner}/{repo}",
+        "description": f"Synthetic repository {owner}/{repo}",
+        "url": f"{base}/repos/{owner}/{repo}",
+        "html_url": f"https://github.com/{owner}/{repo}",
+        "owner": {"login": owner, "id": 1, "type": "User"},
+    }
+
+
+@app.get("/github/repos/{owner}/{repo}/readme")
+async def github_readme(owner: str, repo: str, request: Request):
+    await _simulate_latency("github")
+    base = str(request.base_url).rstrip("/") + "/github"
+    return {
+        "type": "file",
+        "encoding": "base64",
+        "name": "README.md",
+        "path": "README.md",
+        "content": base64.b64encode(config["readme"].encode("utf-8")).decode("ascii"),
+        "url": f"{base}/repos/{owner}/{repo}/contents/README.md",
+    }
+
+
+@app.get("/github/repos/{owner}/{repo}/contents/{path:path}")
+async def github_contents(owner: str, repo: str, path: str, request: Request):
+    await _simulate_latency("github")
+    base = str(request.base_url).rstrip("/") + "/github"
+    path = path.strip("/")
+    tree = _repo_tree()
+    if path not in tree:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return [
+        {
+            "type": kind,
+            "name": name,
+            "path": f"{path}/{name}" if path else name,
+            "sha": uuid.uuid5(uuid.NAMESPACE_URL, f"{path}/{name}").hex,
+            "size": 0,
+            "url": f"{base}/repos/{owner}/{repo}/contents/{path}/{name}".replace("contents//", "contents/"),
+        }
+        for name, kind in tree[path]
+    ]
+
+
+@app.get("/health")
+async def health_check():
+    return {"status": "good"}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run the helix benchmark stand-in servers")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--script", help="JSON file overriding latencies, tool-call plan and canned outputs")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiply all simulated latencies")
+    args = parser.parse_args()
+
+    load_script(args.script, args.latency_scale)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -1,12 +1,18 @@
 import json, os, logging, asyncio
-from openai import OpenAI
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
-import mcp.types as mcp_types
+from contextlib import AsyncExitStack
+from typing import TYPE_CHECKING
 from dotenv import load_dotenv
-from cerebras.cloud.sdk import Cerebras
+from telemetry import span, record_usage, record_tool_output, log_payload
 load_dotenv()
 
+from segment_store import STORAGE_BACKEND
+
+# openai, cerebras and mcp are imported on first use; they dominate import time
+if TYPE_CHECKING:
+    import mcp.types as mcp_types
+    from cerebras.cloud.sdk import Cerebras
+    from openai import OpenAI
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -14,13 +20,36 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 MODEL = os.getenv("MODEL")
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
 
 LINKS_AGENT_PROMPT = os.environ.get("LINKS_AGENT_PROMPT", "")
 DOCS_AGENT_PROMPT = os.environ.get("DOCS_AGENT_PROMPT", "")
 MEDIA_AGENT_PROMPT = os.environ.get("MEDIA_AGENT_PROMPT", "")
 SYNTHESIS_AGENT_PROMPT = os.environ.get("SYNTHESIS_AGENT_PROMPT", "")
 
-def mcp_tool_to_openrouter(t: mcp_types.Tool) -> dict:
+_openrouter_client: "OpenAI | None" = None
+_cerebras_client: "Cerebras | None" = None
+
+def get_openrouter_client() -> "OpenAI":
+    """Return the shared OpenRouter client, creating it on first use."""
+    global _openrouter_client
+    if _openrouter_client is None:
+        from openai import OpenAI
+        _openrouter_client = OpenAI(
+            base_url=OPENROUTER_BASE_URL,
+            api_key=os.environ.get("OPENROUTER_API_KEY")
+        )
+    return _openrouter_client
+
+def get_cerebras_client() -> "Cerebras":
+    """Return the shared Cerebras client, creating it on first use."""
+    global _cerebras_client
+    if _cerebras_client is None:
+        from cerebras.cloud.sdk import Cerebras
+        _cerebras_client = Cerebras(api_key=os.environ["CEREBRAS_API_KEY"])
+    return _cerebras_client
+
+def mcp_tool_to_openrouter(t: "mcp_types.Tool") -> dict:
     """Convert MCP tool definition to OpenRouter/OpenAI function format."""
     return {
         "type": "function",
@@ -47,51 +76,60 @@ async def agent(user_id: str, user_query: str, subdirectory: str, system_prompt:
     logger.info(f"Starting {subdirectory} agent for user {user_id}")
     
     try:
+        import mcp.types as mcp_types
+        from mcp import ClientSession, StdioServerParameters
+        from mcp.client.stdio import stdio_client
+
         server = StdioServerParameters(
             command="python",
             args=["mcp_server.py"],
-            env={"USER_ID": user_id, "SUBDIRECTORY": subdirectory}
+            # The stdio client only forwards a few basic variables, so pass the tools' settings explicitly
+            env={"USER_ID": user_id, "SUBDIRECTORY": subdirectory, "STORAGE_BACKEND": STORAGE_BACKEND}
         )
         
-        async with stdio_client(server) as (read, write):
-            async with ClientSession(read, write) as session:
+        async with AsyncExitStack() as stack:
+            with span("mcp_startup", agent=subdirectory):
+                read, write = await stack.enter_async_context(stdio_client(server))
+                session = await stack.enter_async_context(ClientSession(read, write))
                 await session.initialize()
-
                 tools_resp = await session.list_tools()
-                logger.info(f"{subdirectory} agent - Available tools: {[t.name for t in tools_resp.tools]}")
-                tools_for_model = [mcp_tool_to_openrouter(t) for t in tools_resp.tools]
 
-                client = OpenAI(
-                    base_url="https://openrouter.ai/api/v1",
-                    api_key=os.environ.get("OPENROUTER_API_KEY")
-                )
+            logger.info(f"{subdirectory} agent - Available tools: {[t.name for t in tools_resp.tools]}")
+            tools_for_model = [mcp_tool_to_openrouter(t) for t in tools_resp.tools]
 
-                messages = [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_query},
-                ]
-                
-                logger.info(f"{subdirectory} agent - Processing query: {user_query}")
+            client = get_openrouter_client()
+
+            messages = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_query},
+            ]
+            
+            logger.info(f"{subdirectory} agent - Processing query: {user_query}")
 
+            with span("llm_call", agent=subdirectory, model=MODEL, turn=0) as s:
                 response = client.chat.completions.create(
                     model=MODEL,
                     messages=messages,
                     tools=tools_for_model,
                 )
-                
-                msg = response.choices[0].message
-                logger.info(f"{subdirectory} agent - Initial response: {msg.model_dump()}")
+                record_usage(s, response.usage)
+            
+            msg = response.choices[0].message
+            log_payload(logger, lambda: f"{subdirectory} agent - Initial response: {msg.model_dump()}")
 
-                while msg.tool_calls:
-                    logger.info(f"{subdirectory} agent - Tool calls requested: {len(msg.tool_calls)}")
-                    messages.append(msg.model_dump())
+            turn = 0
+            while msg.tool_calls:
+                turn += 1
+                logger.info(f"{subdirectory} agent - Tool calls requested: {len(msg.tool_calls)}")
+                messages.append(msg.model_dump())
 
-                    for call in msg.tool_calls:
-                        name = call.function.name
-                        args = json.loads(call.function.arguments or "{}")
-                        
-                        logger.info(f"{subdirectory} agent - Executing tool: {name} with args: {args}")
+                for call in msg.tool_calls:
+                    name = call.function.name
+                    args = json.loads(call.function.arguments or "{}")
+                    
+                    log_payload(logger, lambda: f"{subdirectory} agent - Executing tool: {name} with args: {args}")
 
+                    with span("tool_call", agent=subdirectory, tool=name) as s:
                         result = await session.call_tool(name, args)
 
                         payload = None
@@ -103,28 +141,31 @@ async def agent(user_id: str, user_query: str, subdirectory: str, system_prompt:
                                 if isinstance(c, mcp_types.TextContent):
                                     parts.append(c.text)
                             payload = "\n".join(parts) if parts else ""
-                        
-                        logger.info(f"{subdirectory} agent - Tool {name} result: {payload}")
+                        record_tool_output(s, name, payload)
+                    
+                    log_payload(logger, lambda: f"{subdirectory} agent - Tool {name} result: {payload}")
 
-                        messages.append({
-                            "role": "tool",
-                            "tool_call_id": call.id,
-                            "content": payload,
-                        })
+                    messages.append({
+                        "role": "tool",
+                        "tool_call_id": call.id,
+                        "content": payload,
+                    })
 
+                with span("llm_call", agent=subdirectory, model=MODEL, turn=turn) as s:
                     follow = client.chat.completions.create(
                         model=MODEL,
                         messages=messages,
                     )
-                    msg = follow.choices[0].message
-                    logger.info(f"{subdirectory} agent - Follow-up response: {msg.model_dump()}")
-
-                logger.info(f"{subdirectory} agent - Final response: {msg.content}")
-                return {
-                    "subdirectory": subdirectory,
-                    "result": msg.content or "",
-                    "error": None
-                }
+                    record_usage(s, follow.usage)
+                msg = follow.choices[0].message
+                log_payload(logger, lambda: f"{subdirectory} agent - Follow-up response: {msg.model_dump()}")
+
+            log_payload(logger, lambda: f"{subdirectory} agent - Final response: {msg.content}")
+            return {
+                "subdirectory": subdirectory,
+                "result": msg.content or "",
+                "error": None
+            }
                 
     except Exception as e:
         logger.error(f"{subdirectory} agent - Error: {str(e)}")
@@ -196,22 +237,24 @@ async def helix(user_id: str, user_query: str, timeout: int = 600) -> str:
     
     try:
         logger.info("Calling Cerebras for synthesis")
-        cerebras_client = Cerebras(api_key=os.environ["CEREBRAS_API_KEY"])
+        cerebras_client = get_cerebras_client()
         prompt = f"""
                 User Query: {user_query}
                 Search Results:
                 {concatenated_results}
                 Please provide a well-structured summary that directly addresses the user's query.
                 """
-        summary_response = cerebras_client.chat.completions.create(
-            model="llama3.3-70b",
-            messages=[
-                {"role": "system", "content": SYNTHESIS_AGENT_PROMPT},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,
-            max_tokens=2048,
-        )
+        with span("synthesis", model="llama3.3-70b", input_chars=len(concatenated_results)) as s:
+            summary_response = cerebras_client.chat.completions.create(
+                model="llama3.3-70b",
+                messages=[
+                    {"role": "system", "content": SYNTHESIS_AGENT_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.3,
+                max_tokens=2048,
+            )
+            record_usage(s, summary_response.usage)
         summary = summary_response.choices[0].message.content
         logger.info(f"Summarization complete for user {user_id}")
         
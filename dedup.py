@@ -0,0 +1,267 @@
+import hashlib
+import os
+import re
+import sqlite3
+import time
+from array import array
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator
+
+from paths import BASE_DIR
+
+# "link" records duplicates in the index without storing them, "skip" drops
+# them silently, "off" disables duplicate detection.
+DEDUP_MODE = os.getenv("DEDUP_MODE", "link")
+
+# Minimum estimated Jaccard similarity for two documents to count as duplicates
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.8"))
+
+SHINGLE_SIZE = 5
+NUM_PERM = 64
+# 16 bands of 4 rows: pairs at 0.8 similarity share a bucket with >99.9% probability;
+# candidates are then verified against DEDUP_THRESHOLD using the full signature
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+_EMPTY = (1 << 64) - 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    path TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    signature BLOB NOT NULL,
+    canonical_path TEXT,
+    similarity REAL,
+    source TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_sha ON documents (sha256);
+CREATE INDEX IF NOT EXISTS documents_canonical ON documents (canonical_path);
+CREATE TABLE IF NOT EXISTS bands (
+    band INTEGER NOT NULL,
+    bucket TEXT NOT NULL,
+    path TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS bands_bucket ON bands (band, bucket);
+CREATE INDEX IF NOT EXISTS bands_path ON bands (path);
+"""
+
+_URL_LINE = re.compile(r"^\*\*URL:\*\*.*$", re.MULTILINE)
+_MARKUP = re.compile(r"[#*_>`|\[\]()~-]+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase, drop markdown punctuation and source URL lines, and collapse whitespace."""
+    text = _URL_LINE.sub(" ", text)
+    text = _MARKUP.sub(" ", text.lower())
+    return " ".join(text.split())
+
+
+@dataclass
+class Fingerprint:
+    sha256: str
+    signature: list[int]
+
+
+def fingerprint(text: str) -> Fingerprint | None:
+    """Compute the exact hash and MinHash signature of a document.
+
+    Returns:
+        The fingerprint, or None if the document has no words to compare
+    """
+    words = normalize(text).split()
+    if not words:
+        return None
+    sha = hashlib.sha256(" ".join(words).encode("utf-8")).hexdigest()
+    shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(max(1, len(words) - SHINGLE_SIZE + 1))}
+    # One-permutation MinHash: each shingle hash lands in one of NUM_PERM bins and
+    # the bin keeps its minimum, so the signature costs a single pass over the shingles.
+    signature = [_EMPTY] * NUM_PERM
+    for s in shingles:
+        h = int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+        b, v = h % NUM_PERM, h // NUM_PERM
+        if v < signature[b]:
+            signature[b] = v
+    # Densify: empty bins (short documents) borrow the next filled bin's value
+    filled = [i for i, v in enumerate(signature) if v != _EMPTY]
+    for i in range(NUM_PERM):
+        if signature[i] == _EMPTY:
+            j = next((k for k in filled if k > i), filled[0])
+            signature[i] = signature[j] ^ (((i + 1) * 0x9E3779B97F4A7C15) & _EMPTY)
+    return Fingerprint(sha, signature)
+
+
+def similarity(a: list[int], b: list[int]) -> float:
+    """Estimated Jaccard similarity of two MinHash signatures."""
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+def _band_buckets(signature: list[int]) -> list[tuple[int, str]]:
+    return [
+        (band, hashlib.blake2b(array("Q", signature[band * ROWS:(band + 1) * ROWS]).tobytes(), digest_size=8).hexdigest())
+        for band in range(BANDS)
+    ]
+
+
+class DedupIndex:
+    """Per-user fingerprint and LSH index stored in uploads/<user_id>/dedup.sqlite3.
+
+    Paths are relative to the user's processed directory, e.g. 'links/foo.md'.
+    Only canonical documents are added to the LSH bands, so every duplicate
+    links directly to a stored document and clusters do not chain.
+    """
+
+    def __init__(self, user_id: str):
+        db_path = BASE_DIR / user_id / "dedup.sqlite3"
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, isolation_level=None, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(_SCHEMA)
+
+    def __enter__(self) -> "DedupIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._conn.close()
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """Hold the index's write lock across a lookup and the writes that depend on it.
+
+        BEGIN IMMEDIATE serializes writers across processes (e.g. several
+        uvicorn workers ingesting for the same user), so two copies of one
+        document cannot both miss each other and both be stored.
+        """
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def find_duplicate(self, fp: Fingerprint, path: str) -> tuple[str, float] | None:
+        """Return (canonical path, similarity) of a stored document that `fp` duplicates.
+
+        The document's own previous version at `path` is never reported, so
+        re-ingesting the same source updates it in place.
+        """
+        row = self._conn.execute(
+            "SELECT path FROM documents WHERE sha256 = ? AND canonical_path IS NULL AND path != ? LIMIT 1",
+            (fp.sha256, path),
+        ).fetchone()
+        if row:
+            return row["path"], 1.0
+
+        candidates: set[str] = set()
+        for band, bucket in _band_buckets(fp.signature):
+            for r in self._conn.execute("SELECT path FROM bands WHERE band = ? AND bucket = ?", (band, bucket)):
+                if r["path"] != path:
+                    candidates.add(r["path"])
+
+        best = None
+        for candidate in candidates:
+            r = self._conn.execute("SELECT signature FROM documents WHERE path = ?", (candidate,)).fetchone()
+            if r is None:
+                continue
+            score = similarity(fp.signature, list(array("Q", r["signature"])))
+            if score >= DEDUP_THRESHOLD and (best is None or score > best[1]):
+                best = (candidate, score)
+        return best
+
+    def add(self, path: str, fp: Fingerprint, source: str | None = None) -> None:
+        """Index a stored (canonical) document, replacing any previous entry for the path."""
+        self.remove(path)
+        self._conn.execute(
+            "INSERT INTO documents (path, sha256, signature, source, created_at) VALUES (?, ?, ?, ?, ?)",
+            (path, fp.sha256, array("Q", fp.signature).tobytes(), source, time.time()),
+        )
+        self._conn.executemany(
+            "INSERT INTO bands (band, bucket, path) VALUES (?, ?, ?)",
+            [(band, bucket, path) for band, bucket in _band_buckets(fp.signature)],
+        )
+
+    def link(self, path: str, fp: Fingerprint, canonical_path: str, score: float, source: str | None = None) -> None:
+        """Record a document that was not stored because it duplicates `canonical_path`."""
+        self.remove(path)
+        self._conn.execute(
+            "INSERT INTO documents (path, sha256, signature, canonical_path, similarity, source, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (path, fp.sha256, array("Q", fp.signature).tobytes(), canonical_path, score, source, time.time()),
+        )
+
+    def is_canonical(self, path: str) -> bool:
+        """Whether `path` is indexed as a stored (canonical) document."""
+        return self._conn.execute(
+            "SELECT 1 FROM documents WHERE path = ? AND canonical_path IS NULL", (path,)
+        ).fetchone() is not None
+
+    def duplicates_of(self, canonical_path: str) -> list[str]:
+        """Paths linked to `canonical_path`, oldest first."""
+        return [
+            r["path"] for r in self._conn.execute(
+                "SELECT path FROM documents WHERE canonical_path = ? ORDER BY created_at", (canonical_path,)
+            )
+        ]
+
+    def rescore(self, canonical_path: str, fp: Fingerprint | None) -> list[str]:
+        """Rescore the duplicates of `canonical_path` against its new content.
+
+        Duplicates that still reach DEDUP_THRESHOLD stay linked with updated
+        scores; the rest are returned, oldest first, and are left for the
+        caller to re-home (see promote).
+        """
+        rows = self._conn.execute(
+            "SELECT path, signature FROM documents WHERE canonical_path = ? ORDER BY created_at", (canonical_path,)
+        ).fetchall()
+        stale = []
+        for r in rows:
+            score = similarity(list(array("Q", r["signature"])), fp.signature) if fp else 0.0
+            if score >= DEDUP_THRESHOLD:
+                self._conn.execute("UPDATE documents SET similarity = ? WHERE path = ?", (score, r["path"]))
+            else:
+                stale.append(r["path"])
+        return stale
+
+    def promote(self, path: str, others: list[str]) -> None:
+        """Make the linked duplicate `path` canonical and move `others` over to it.
+
+        Used when a canonical document's content is replaced: its previous
+        content is stored under `path` instead, and the other duplicates of
+        that content are linked to `path` and rescored against it.
+        """
+        row = self._conn.execute("SELECT signature FROM documents WHERE path = ?", (path,)).fetchone()
+        signature = list(array("Q", row["signature"]))
+        self._conn.execute("UPDATE documents SET canonical_path = NULL, similarity = NULL WHERE path = ?", (path,))
+        self._conn.executemany(
+            "INSERT INTO bands (band, bucket, path) VALUES (?, ?, ?)",
+            [(band, bucket, path) for band, bucket in _band_buckets(signature)],
+        )
+        moved = self._conn.execute(
+            f"SELECT path, signature FROM documents WHERE path IN ({', '.join('?' * len(others))})", others
+        ).fetchall() if others else []
+        self._conn.executemany(
+            "UPDATE documents SET canonical_path = ?, similarity = ? WHERE path = ?",
+            [(path, similarity(list(array("Q", r["signature"])), signature), r["path"]) for r in moved],
+        )
+
+    def remove(self, path: str) -> None:
+        self._conn.execute("DELETE FROM documents WHERE path = ?", (path,))
+        self._conn.execute("DELETE FROM bands WHERE path = ?", (path,))
+
+    def clusters(self) -> list[dict]:
+        """List duplicate clusters as {canonical, source, duplicates: [{path, source, similarity}]}."""
+        clusters: dict[str, dict] = {}
+        rows = self._conn.execute(
+            "SELECT d.path, d.source, d.similarity, d.canonical_path, c.source AS canonical_source "
+            "FROM documents d LEFT JOIN documents c ON c.path = d.canonical_path "
+            "WHERE d.canonical_path IS NOT NULL ORDER BY d.canonical_path, d.created_at"
+        )
+        for r in rows:
+            cluster = clusters.setdefault(
+                r["canonical_path"],
+                {"canonical": r["canonical_path"], "source": r["canonical_source"], "duplicates": []},
+            )
+            cluster["duplicates"].append({"path": r["path"], "source": r["source"], "similarity": r["similarity"]})
+        return list(clusters.values())
@@ -1,7 +1,8 @@
 from pathlib import Path
-from typing import Optional, Set
+from typing import TYPE_CHECKING, Optional, Set
 
-from markitdown import MarkItDown
+if TYPE_CHECKING:
+    from markitdown import MarkItDown
 
 
 # Supported input file extensions (lowercase, without leading dots)
@@ -17,6 +18,23 @@ ALLOWED_EXTENSIONS: Set[str] = {
 }
 
 
+_converter: Optional["MarkItDown"] = None
+
+
+def _get_converter() -> "MarkItDown":
+    """Return the shared MarkItDown converter, creating it on first use.
+
+    markitdown[all] pulls in every format backend, so it is only imported once a
+    file is actually converted.
+    """
+    global _converter
+    if _converter is None:
+        from markitdown import MarkItDown
+
+        _converter = MarkItDown()
+    return _converter
+
+
 def _extract_markdown_from_result(result: object) -> Optional[str]:
     """Best-effort extraction of Markdown text from MarkItDown.convert result.
 
@@ -71,8 +89,7 @@ def process_file(file_path: str) -> str:
             f"Unsupported file type '.{ext}'. Supported: {', '.join(sorted(ALLOWED_EXTENSIONS))}"
         )
 
-    converter = MarkItDown()
-    conversion_result = converter.convert(str(path))
+    conversion_result = _get_converter().convert(str(path))
 
     markdown = _extract_markdown_from_result(conversion_result)
     if not isinstance(markdown, str) or markdown.strip() == "":
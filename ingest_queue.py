@@ -0,0 +1,474 @@
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import os
+import re
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from urllib.parse import urlparse
+
+from dedup import DEDUP_MODE, DedupIndex, fingerprint
+from file_helper import process_file
+from media_helper import transcribe_media
+from outline import outline_path, write_outline
+from paths import BASE_DIR
+from segment_store import STORAGE_BACKEND, SegmentStore, compact_all
+from process_url import detect_url_type, fetch_web_html, url_to_markdown, web_html_to_markdown
+from telemetry import span
+
+logger = logging.getLogger(__name__)
+
+QUEUE_DB = BASE_DIR / "ingest_queue.sqlite3"
+
+# job kind -> processed subdirectory the converted markdown is written to
+KIND_SUBDIRECTORIES = {"url": "links", "file": "docs", "media": "media"}
+
+# Base delay before a failed job is retried; doubles with each attempt
+RETRY_BACKOFF_SECONDS = 5.0
+
+# Seconds between compaction passes over segment stores (STORAGE_BACKEND=segments)
+COMPACTION_INTERVAL_SECONDS = float(os.getenv("COMPACTION_INTERVAL_SECONDS", "3600"))
+
+# A running job belongs to the worker process that claimed it until its lease
+# expires; the owner renews leases while the job runs, so only jobs whose
+# owner stopped renewing (crashed or was killed) are re-queued.
+LEASE_SECONDS = float(os.getenv("INGEST_LEASE_SECONDS", "60"))
+
+# Niceness applied to conversion worker processes so they yield CPU to search
+INGEST_NICE = int(os.getenv("INGEST_NICE", "10"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    source TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    run_after REAL NOT NULL DEFAULT 0,
+    error TEXT,
+    output_path TEXT,
+    claimed_by TEXT,
+    lease_expires REAL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (kind, status, priority DESC, id);
+"""
+
+
+class JobQueue:
+    """Durable SQLite-backed ingestion job queue.
+
+    Jobs are claimed highest priority first, then oldest first. Failed jobs are
+    retried with exponential backoff until max_attempts is reached.
+
+    Several processes (e.g. uvicorn workers) may share one queue. Claimed jobs
+    record the claiming worker and a lease that it renews while they run;
+    recover() only re-queues jobs whose lease has expired.
+    """
+
+    def __init__(self, db_path: Path = QUEUE_DB, worker_id: str | None = None, lease_seconds: float = LEASE_SECONDS):
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.lease_seconds = lease_seconds
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        # Queues created before leases existed lack the ownership columns
+        columns = {r["name"] for r in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column, kind in (("claimed_by", "TEXT"), ("lease_expires", "REAL")):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+        self._lock = threading.Lock()
+
+    def enqueue(self, user_id: str, kind: str, source: str, priority: int = 0, max_attempts: int = 3) -> int:
+        """Add a job to the queue and return its id."""
+        if kind not in KIND_SUBDIRECTORIES:
+            raise ValueError(f"Unknown job kind '{kind}'")
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (user_id, kind, source, priority, max_attempts, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (user_id, kind, source, priority, max_attempts, now, now),
+            )
+        return cursor.lastrowid
+
+    def claim(self, kind: str) -> dict | None:
+        """Atomically mark the next runnable job of this kind as running and return it."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, claimed_by = ?, lease_expires = ?, "
+                "updated_at = ? "
+                "WHERE id = (SELECT id FROM jobs WHERE kind = ? AND status = 'queued' AND run_after <= ? "
+                "ORDER BY priority DESC, id LIMIT 1) RETURNING *",
+                (self.worker_id, now + self.lease_seconds, now, kind, now),
+            ).fetchone()
+        return dict(row) if row else None
+
+    def complete(self, job_id: int, output_path: str, status: str = "done") -> bool:
+        """Mark a job finished; status is 'done', or 'duplicate' when output_path is an existing document.
+
+        Returns:
+            False if this worker no longer owns the job (its lease expired and it was re-queued)
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, error = NULL, output_path = ?, lease_expires = NULL, updated_at = ? "
+                "WHERE id = ? AND claimed_by = ?",
+                (status, output_path, time.time(), job_id, self.worker_id),
+            )
+        return cursor.rowcount > 0
+
+    def fail(self, job_id: int, error: str) -> bool:
+        """Record a failure; re-queue with backoff unless attempts are exhausted.
+
+        Returns:
+            True if the job is now permanently failed
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT attempts, max_attempts FROM jobs WHERE id = ? AND claimed_by = ?", (job_id, self.worker_id)
+            ).fetchone()
+            if row is None:
+                return False
+            if row["attempts"] < row["max_attempts"]:
+                delay = RETRY_BACKOFF_SECONDS * 2 ** (row["attempts"] - 1)
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'queued', error = ?, run_after = ?, lease_expires = NULL, updated_at = ? "
+                    "WHERE id = ?",
+                    (error, now + delay, now, job_id),
+                )
+                return False
+            else:
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, lease_expires = NULL, updated_at = ? WHERE id = ?",
+                    (error, now, job_id),
+                )
+                return True
+
+    def get(self, job_id: int) -> dict | None:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def renew(self) -> int:
+        """Extend the leases of every job this worker is running; returns how many were renewed."""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE status = 'running' AND claimed_by = ?",
+                (now + self.lease_seconds, self.worker_id),
+            )
+        return cursor.rowcount
+
+    def recover(self) -> int:
+        """Re-queue running jobs whose lease expired because their worker stopped renewing it."""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'queued', claimed_by = NULL, lease_expires = NULL, updated_at = ? "
+                "WHERE status = 'running' AND (lease_expires IS NULL OR lease_expires < ?)",
+                (now, now),
+            )
+        return cursor.rowcount
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def atomic_write_text(path: Path, text: str) -> None:
+    """Write text so readers only ever see the old or the complete new file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def store_markdown(user_id: str, subdirectory: str, name: str, markdown: str) -> Path:
+    """Write converted markdown into uploads/<user_id>/processed/<subdirectory>/<name>.
+
+    The document's outline (see outline.py) is computed and stored alongside.
+    With STORAGE_BACKEND=segments the document is appended to the user's
+    segment store instead and the returned path is its logical location.
+
+    Args:
+        user_id: Unique identifier for the user
+        subdirectory: Processed subdirectory (links/docs/media)
+        name: File name within the subdirectory
+
+    Returns:
+        Path of the written file
+    """
+    path = BASE_DIR / user_id / "processed" / subdirectory / name
+    if STORAGE_BACKEND == "segments":
+        with SegmentStore.open(user_id, subdirectory) as store:
+            store.put(name, markdown)
+        return path
+    atomic_write_text(path, markdown)
+    # Written after the document so its mtime marks the outline as up to date
+    write_outline(user_id, subdirectory, name, markdown)
+    return path
+
+
+def load_markdown(user_id: str, subdirectory: str, name: str) -> str | None:
+    """Read back a document written by store_markdown, or None if it does not exist."""
+    if STORAGE_BACKEND == "segments":
+        with SegmentStore.open(user_id, subdirectory) as store:
+            return store.get(name)
+    try:
+        return (BASE_DIR / user_id / "processed" / subdirectory / name).read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return None
+
+
+def remove_markdown(user_id: str, subdirectory: str, name: str) -> None:
+    """Delete a stored document (and its outline) written by store_markdown, if present."""
+    if STORAGE_BACKEND == "segments":
+        with SegmentStore.open(user_id, subdirectory) as store:
+            store.delete(name)
+        return
+    (BASE_DIR / user_id / "processed" / subdirectory / name).unlink(missing_ok=True)
+    outline_path(user_id, subdirectory, name).unlink(missing_ok=True)
+
+
+def output_name(kind: str, source: str) -> str:
+    """Deterministic markdown file name for a job, so retries overwrite rather than duplicate.
+
+    The name is stable per source (URL, or stored upload path) and carries a
+    digest of it, so different uploads that share a file name do not collide.
+    """
+    digest = hashlib.sha1(source.encode("utf-8")).hexdigest()[:8]
+    if kind == "url":
+        parsed = urlparse(source)
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", f"{parsed.netloc}{parsed.path}").strip("-")[:80]
+        return f"{slug}-{digest}.md"
+    # Uploaded files are stored as <upload id>-<original name>; keep the readable name, the digest covers the id
+    stem = Path(source).name.split("-", 1)[-1].rsplit(".", 1)[0]
+    return f"{stem}-{digest}.md"
+
+
+def _hand_off(user_id: str, index: DedupIndex, rel_path: str, heirs: list[str]) -> None:
+    """Store the current content of canonical rel_path under heirs[0], canonical for the other heirs.
+
+    Called before rel_path's content is replaced or removed, so documents that
+    were only linked to it keep a stored copy of what they duplicate.
+    """
+    if not heirs:
+        return
+    subdirectory, name = rel_path.split("/", 1)
+    previous = load_markdown(user_id, subdirectory, name)
+    if previous is None:
+        return
+    heir_subdirectory, heir_name = heirs[0].split("/", 1)
+    store_markdown(user_id, heir_subdirectory, heir_name, previous)
+    index.promote(heirs[0], heirs[1:])
+
+
+def store_document(user_id: str, kind: str, source: str, markdown: str) -> tuple[Path, bool]:
+    """Store converted markdown for a job unless it duplicates a stored document.
+
+    Duplicates (exact or MinHash near-duplicates, see dedup.py) are not written;
+    depending on DEDUP_MODE they are linked to the existing document in the
+    user's dedup index or skipped.
+
+    Re-ingesting a stored (canonical) source replaces its content. Documents
+    linked to it that no longer duplicate the new content would lose their
+    stored copy, so the previous content is first kept under the oldest of
+    them, which becomes canonical for the rest. If the new content itself
+    duplicates another document, the source's own stored copy is removed.
+
+    Returns:
+        (path of the stored document or of the existing document it duplicates, whether it was a duplicate)
+    """
+    subdirectory = KIND_SUBDIRECTORIES[kind]
+    name = output_name(kind, source)
+    if DEDUP_MODE == "off":
+        return store_markdown(user_id, subdirectory, name, markdown), False
+
+    rel_path = f"{subdirectory}/{name}"
+    origin = source if kind == "url" else Path(source).name.split("-", 1)[-1]
+    fp = fingerprint(markdown)
+    with DedupIndex(user_id) as index, index.transaction():
+        match = index.find_duplicate(fp, rel_path) if fp else None
+        if index.is_canonical(rel_path):
+            _hand_off(user_id, index, rel_path, index.duplicates_of(rel_path) if match else index.rescore(rel_path, fp))
+            if match:
+                remove_markdown(user_id, subdirectory, name)
+            index.remove(rel_path)
+        if match:
+            canonical, score = match
+            if DEDUP_MODE == "link":
+                index.link(rel_path, fp, canonical, score, origin)
+            return BASE_DIR / user_id / "processed" / canonical, True
+
+        path = store_markdown(user_id, subdirectory, name, markdown)
+        if fp:
+            index.add(rel_path, fp, origin)
+        return path, False
+
+
+def _lower_priority() -> None:
+    if hasattr(os, "nice"):
+        os.nice(INGEST_NICE)
+
+
+class IngestWorkers:
+    """Per-kind worker pools draining a JobQueue.
+
+    URL and media jobs are network-bound and run as asyncio tasks (the blocking
+    fetches and SDK calls are moved to threads). File conversion and the
+    HTML-to-markdown step of web URLs are CPU-bound and run in a separate,
+    lower-priority process pool so they do not hold the GIL or the CPU away
+    from search requests. The pool is only spawned once this process first
+    needs it, so every uvicorn worker does not start its own up front.
+    """
+
+    def __init__(self, queue: JobQueue, url_workers: int = 4, file_workers: int = 2, media_workers: int = 2,
+                 poll_interval: float = 1.0):
+        self.queue = queue
+        self.pool_sizes = {"url": url_workers, "file": file_workers, "media": media_workers}
+        self.poll_interval = poll_interval
+        self._wakeups = {kind: asyncio.Event() for kind in KIND_SUBDIRECTORIES}
+        self._tasks: list[asyncio.Task] = []
+        self._processes: ProcessPoolExecutor | None = None
+
+    def start(self) -> None:
+        self._tasks.append(asyncio.create_task(self._lease_keeper()))
+        for kind, size in self.pool_sizes.items():
+            for _ in range(size):
+                self._tasks.append(asyncio.create_task(self._worker(kind)))
+        if STORAGE_BACKEND == "segments":
+            self._tasks.append(asyncio.create_task(self._compactor()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        if self._processes is not None:
+            self._processes.shutdown(wait=False, cancel_futures=True)
+            self._processes = None
+
+    def _new_process_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.pool_sizes["file"],
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_lower_priority,
+        )
+
+    def notify(self, kind: str) -> None:
+        """Wake an idle worker of this kind after a job was enqueued. Call from the event loop thread."""
+        self._wakeups[kind].set()
+
+    async def _worker(self, kind: str) -> None:
+        wakeup = self._wakeups[kind]
+        while True:
+            wakeup.clear()
+            job = await asyncio.to_thread(self.queue.claim, kind)
+            if job is None:
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _lease_keeper(self) -> None:
+        """Renew this process's job leases and re-queue jobs whose owner has gone away."""
+        while True:
+            try:
+                await asyncio.to_thread(self.queue.renew)
+                requeued = await asyncio.to_thread(self.queue.recover)
+                if requeued:
+                    logger.info(f"Re-queued {requeued} ingestion jobs with expired leases")
+            except Exception as e:
+                logger.warning(f"Ingestion lease renewal failed: {e}")
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+
+    async def _compactor(self) -> None:
+        while True:
+            await asyncio.sleep(COMPACTION_INTERVAL_SECONDS)
+            try:
+                with span("compaction"):
+                    reclaimed = await asyncio.to_thread(compact_all)
+                if reclaimed:
+                    logger.info(f"Compaction reclaimed {reclaimed} bytes")
+            except Exception as e:
+                logger.warning(f"Segment compaction failed: {e}")
+
+    async def _run(self, job: dict) -> None:
+        kind, job_id = job["kind"], job["id"]
+        try:
+            with span(f"ingest_{kind}", job_id=job_id, attempt=job["attempts"]):
+                markdown = await self._convert(kind, job["source"])
+                path, duplicate = await asyncio.to_thread(store_document, job["user_id"], kind, job["source"], markdown)
+            if duplicate:
+                finished = await asyncio.to_thread(self.queue.complete, job_id, str(path), "duplicate")
+                logger.info(f"Ingestion job {job_id} ({kind}) duplicates {path}, not stored")
+            else:
+                finished = await asyncio.to_thread(self.queue.complete, job_id, str(path))
+                logger.info(f"Ingestion job {job_id} ({kind}) done: {path}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Ingestion job {job_id} ({kind}) failed on attempt {job['attempts']}: {e}")
+            finished = await asyncio.to_thread(self.queue.fail, job_id, str(e))
+        if finished and kind in ("file", "media"):
+            # The markdown (or its duplicate link) is the stored copy; the raw upload is not kept
+            Path(job["source"]).unlink(missing_ok=True)
+
+    async def _in_processes(self, fn, *args):
+        """Run a CPU-bound conversion step in the low-priority process pool."""
+        if self._processes is None:
+            self._processes = self._new_process_pool()
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._processes, fn, *args)
+        except BrokenProcessPool:
+            # A converter crashed its worker (e.g. OOM); replace the pool so later jobs can run
+            self._processes.shutdown(wait=False, cancel_futures=True)
+            self._processes = self._new_process_pool()
+            raise
+
+    async def _convert(self, kind: str, source: str) -> str:
+        if kind == "url":
+            if detect_url_type(source) == "web":
+                # Fetch on a thread; parsing and markdownify hold the GIL, so they go to the process pool
+                markdown = await asyncio.to_thread(fetch_web_html, source)
+                if not markdown.startswith("Error"):
+                    markdown = await self._in_processes(web_html_to_markdown, markdown, source)
+            else:
+                # GitHub and YouTube conversions are API calls plus string assembly
+                markdown = await asyncio.to_thread(url_to_markdown, source)
+            # process_url reports failures as "Error..." strings rather than raising
+            if markdown.startswith("Error"):
+                raise RuntimeError(markdown.splitlines()[0])
+            return markdown
+        if kind == "file":
+            return await self._in_processes(process_file, source)
+        transcript = await asyncio.to_thread(transcribe_media, source)
+        title = Path(source).name.split("-", 1)[-1]
+        return f"# Media Transcript: {title}\n\n{transcript}\n"
@@ -1,16 +1,22 @@
+import io
 import logging
 import os
 import re
 from pathlib import Path
+from typing import Iterable
+
+from dotenv import load_dotenv
 
 logging.basicConfig(level=logging.INFO)
+load_dotenv()
 
 from mcp.server.fastmcp import FastMCP
 
-mcp = FastMCP("local_tools")
+from outline import format_outline, load_outline
+from paths import BASE_DIR
+from segment_store import STORAGE_BACKEND, SegmentStore
 
-# directory for storing user data (in uploads folder at project root)
-BASE_DIR = Path(__file__).parent / "uploads"
+mcp = FastMCP("local_tools")
 
 def get_user_dir() -> Path:
     """Get the user's directory based on USER_ID and SUBDIRECTORY environment variables.
@@ -38,19 +44,50 @@ def validate_path(user_dir: Path, rel_path: str) -> Path:
         raise ValueError(f"Access denied: path '{rel_path}' is outside user directory")
     return full_path
 
+def get_user_store() -> SegmentStore:
+    """Open the user's segment store for SUBDIRECTORY (STORAGE_BACKEND=segments)."""
+    return SegmentStore.open(os.getenv("USER_ID"), os.getenv("SUBDIRECTORY"))
+
+def store_path(user_dir: Path, full_path: Path) -> str:
+    """Relative, '/'-separated key of a validated path in the segment store ('' for the root)."""
+    rel_path = full_path.relative_to(user_dir.resolve()).as_posix()
+    return "" if rel_path == "." else rel_path
+
+def _select_lines(lines: Iterable[str], start_line: int | None, end_line: int | None) -> str:
+    """Join the lines between start_line and end_line (1-based, inclusive)."""
+    first = max(start_line or 1, 1)
+    selected = []
+    for line_num, line in enumerate(lines, 1):
+        if end_line is not None and line_num > end_line:
+            break
+        if line_num >= first:
+            selected.append(line)
+    return "".join(selected)
+
 @mcp.tool()
-def read_file(file_path: str) -> str:
-    """Read and return the contents of a file.
+def read_file(file_path: str, start_line: int | None = None, end_line: int | None = None) -> str:
+    """Read and return the contents of a file, optionally only a range of lines.
     
     Args:
         file_path: Relative path to the file.
+        start_line: Optional first line to return (1-based, inclusive), e.g. from the outline tool.
+        end_line: Optional last line to return (1-based, inclusive).
         
     Returns:
-        The contents of the file as a string.
+        The contents of the file (or the requested lines) as a string.
     """
     user_dir = get_user_dir()
     full_path = validate_path(user_dir, file_path)
     
+    if STORAGE_BACKEND == "segments":
+        with get_user_store() as store:
+            text = store.get(store_path(user_dir, full_path))
+        if text is None:
+            raise FileNotFoundError(f"File '{file_path}' not found")
+        if start_line is None and end_line is None:
+            return text
+        return _select_lines(io.StringIO(text), start_line, end_line)
+    
     if not full_path.exists():
         raise FileNotFoundError(f"File '{file_path}' not found")
     
@@ -59,9 +96,48 @@ def read_file(file_path: str) -> str:
     
     try:
         with open(full_path, 'r', encoding='utf-8') as f:
-            return f.read()
+            if start_line is None and end_line is None:
+                return f.read()
+            return _select_lines(f, start_line, end_line)
+    except UnicodeDecodeError:
+        raise ValueError(f"'{file_path}' is not a text file or uses unsupported encoding")
+
+@mcp.tool()
+def outline(file_path: str) -> str:
+    """Return a compact table of contents of a file with line ranges.
+    
+    Lists headings, slides, pages and transcript time blocks. Use it before
+    read_file to read only the relevant section via start_line/end_line.
+    
+    Args:
+        file_path: Relative path to the file.
+        
+    Returns:
+        One 'L<start>-<end>  <title>' row per section, indented by nesting level.
+    """
+    user_dir = get_user_dir()
+    full_path = validate_path(user_dir, file_path)
+    
+    if STORAGE_BACKEND == "segments":
+        with get_user_store() as store:
+            result = store.outline(store_path(user_dir, full_path))
+        if result is None:
+            raise FileNotFoundError(f"File '{file_path}' not found")
+        return format_outline(result, file_path)
+    
+    if not full_path.exists():
+        raise FileNotFoundError(f"File '{file_path}' not found")
+    
+    if not full_path.is_file():
+        raise ValueError(f"'{file_path}' is not a file")
+    
+    rel_path = str(full_path.relative_to(user_dir.resolve()))
+    try:
+        result = load_outline(os.getenv("USER_ID"), os.getenv("SUBDIRECTORY"), rel_path, full_path)
     except UnicodeDecodeError:
         raise ValueError(f"'{file_path}' is not a text file or uses unsupported encoding")
+    
+    return format_outline(result, file_path)
 
 @mcp.tool()
 def list_file(directory_path: str = "") -> str:
@@ -76,13 +152,27 @@ def list_file(directory_path: str = "") -> str:
     user_dir = get_user_dir()
     full_path = validate_path(user_dir, directory_path)
     
+    items = []
+    if STORAGE_BACKEND == "segments":
+        with get_user_store() as store:
+            prefix = store_path(user_dir, full_path)
+            children = store.list_dir(prefix)
+            if children is None:
+                if store.exists(prefix):
+                    raise ValueError(f"'{directory_path}' is not a directory")
+                raise FileNotFoundError(f"Directory '{directory_path or '.'}' not found")
+        for name, is_dir in children:
+            items.append(f"[DIR]  {name}" if is_dir else f"[FILE] {name}")
+        if not items:
+            return f"Directory '{directory_path or '.'}' is empty"
+        return "\n".join(items)
+    
     if not full_path.exists():
         raise FileNotFoundError(f"Directory '{directory_path or '.'}' not found")
     
     if not full_path.is_dir():
         raise ValueError(f"'{directory_path}' is not a directory")
     
-    items = []
     for item in sorted(full_path.iterdir()):
         if item.is_dir():
             items.append(f"[DIR]  {item.name}")
@@ -114,7 +204,19 @@ def grep(pattern: str, file_path: str | None = None) -> str:
     matches = []
     max_matches = 100
     
-    if file_path:
+    if STORAGE_BACKEND == "segments":
+        with get_user_store() as store:
+            if file_path:
+                text = store.get(store_path(user_dir, validate_path(user_dir, file_path)))
+                if text is None:
+                    raise FileNotFoundError(f"File '{file_path}' not found")
+                matches = _search_lines(io.StringIO(text), regex, file_path, max_matches)
+            else:
+                for rel_path, text in store.iter_documents():
+                    matches.extend(_search_lines(io.StringIO(text), regex, rel_path, max_matches - len(matches)))
+                    if len(matches) >= max_matches:
+                        break
+    elif file_path:
         full_path = validate_path(user_dir, file_path)
         
         if not full_path.exists():
@@ -148,6 +250,17 @@ def grep(pattern: str, file_path: str | None = None) -> str:
     
     return result
 
+def _search_lines(lines: Iterable[str], regex: re.Pattern, display_name: str, max_matches: int) -> list[str]:
+    """Helper function to search for pattern in a document read from the segment store."""
+    matches = []
+    for line_num, line in enumerate(lines, 1):
+        if regex.search(line):
+            matches.append(f"{display_name}:{line_num}:{line.rstrip()}")
+            
+            if len(matches) >= max_matches:
+                break
+    return matches
+
 def _search_file(file_path: Path, regex: re.Pattern, display_name: str, max_matches: int) -> list[str]:
     """Helper function to search for pattern in a single file."""
     matches = []
@@ -1,10 +1,38 @@
 from pathlib import Path
-from openai import OpenAI
+from typing import TYPE_CHECKING, Optional, Set
 from dotenv import load_dotenv
 
+if TYPE_CHECKING:
+    from openai import OpenAI
+
 load_dotenv()
 
-client = OpenAI()
+# Media formats accepted by the transcription endpoint (lowercase, without leading dots)
+ALLOWED_EXTENSIONS: Set[str] = {
+    "mp3",
+    "mp4",
+    "mpeg",
+    "mpga",
+    "m4a",
+    "wav",
+    "webm",
+}
+
+_client: Optional["OpenAI"] = None
+
+
+def get_client() -> "OpenAI":
+    """Return the shared OpenAI client, creating it on first use.
+
+    The openai package is imported here rather than at module level to keep
+    importing this module cheap.
+    """
+    global _client
+    if _client is None:
+        from openai import OpenAI
+
+        _client = OpenAI()
+    return _client
 
 def transcribe_media(path: str, response_format: str = "text") -> str:
     """
@@ -24,7 +52,7 @@ def transcribe_media(path: str, response_format: str = "text") -> str:
         raise FileNotFoundError(f"File not found: {path}")
 
     with p.open("rb") as f:
-        resp = client.audio.transcriptions.create(
+        resp = get_client().audio.transcriptions.create(
             model="gpt-4o-mini-transcribe", file=f, response_format=response_format
         )
 
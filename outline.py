@@ -0,0 +1,183 @@
+import json
+import re
+import sys
+from pathlib import Path
+
+from paths import BASE_DIR
+
+# Transcript timestamps are grouped into blocks of this many seconds
+TIMESTAMP_BLOCK_SECONDS = 300
+
+MAX_TITLE_LENGTH = 80
+
+# Entry levels: slides/pages contain headings (1-6), timestamp blocks are leaves
+CONTAINER_LEVEL = 0
+LEAF_LEVEL = 7
+
+_ATX_HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+_FENCE = re.compile(r"^\s*(```|~~~)")
+# MarkItDown marks PowerPoint slides with an HTML comment
+_SLIDE = re.compile(r"^<!--\s*Slide number:\s*(\d+)\s*-->")
+# process_youtube_url writes one "**[MM:SS]** text" line per caption
+_TIMESTAMP = re.compile(r"^\*\*\[(?:(\d+):)?(\d{1,2}):(\d{2})\]\*\*")
+
+
+def _title(text: str) -> str:
+    text = text.strip()
+    return text if len(text) <= MAX_TITLE_LENGTH else text[:MAX_TITLE_LENGTH - 1] + "…"
+
+
+def _format_seconds(seconds: int) -> str:
+    hours, rest = divmod(seconds, 3600)
+    return f"{hours:02d}:{rest // 60:02d}:{rest % 60:02d}" if hours else f"{rest // 60:02d}:{rest % 60:02d}"
+
+
+def compute_outline(markdown: str) -> dict:
+    """
+    Compute a section outline of a markdown document.
+
+    Recognises ATX headings (html_to_markdown and MarkItDown output), MarkItDown
+    slide markers, PDF page breaks (form feeds) and transcript timestamps, which
+    are grouped into TIMESTAMP_BLOCK_SECONDS blocks. Headings inside fenced code
+    blocks are ignored.
+
+    Args:
+        markdown: The document text
+
+    Returns:
+        {"lines": total line count, "entries": [{"level", "kind", "title", "start", "end"}]}
+        with 1-based inclusive line ranges. A section ends where the next entry of
+        the same or a higher level begins.
+    """
+    # Split on newlines only, matching read_file and grep line numbers (splitlines() also breaks on form feeds)
+    lines = markdown.split("\n")
+    if lines and lines[-1] == "":
+        lines.pop()
+    # pdfminer ends every page with a form feed, so breaks followed only by
+    # whitespace up to the end of the document do not start another page
+    page_breaks = [line.count("\f") for line in markdown.rstrip().split("\n")]
+    entries: list[dict] = []
+    in_fence = False
+    page = 1
+    block = None
+
+    if any(page_breaks):
+        entries.append({"level": CONTAINER_LEVEL, "kind": "page", "title": "Page 1", "start": 1})
+
+    for number, line in enumerate(lines, 1):
+        breaks = page_breaks[number - 1] if number <= len(page_breaks) else 0
+        if breaks:
+            page += breaks
+            entries.append({"level": CONTAINER_LEVEL, "kind": "page", "title": f"Page {page}", "start": number})
+            block = None
+
+        if _FENCE.match(line):
+            in_fence = not in_fence
+            continue
+        if in_fence:
+            continue
+
+        slide = _SLIDE.match(line)
+        if slide:
+            entries.append({"level": CONTAINER_LEVEL, "kind": "slide", "title": f"Slide {slide.group(1)}", "start": number})
+            block = None
+            continue
+
+        heading = _ATX_HEADING.match(line)
+        if heading:
+            entries.append({
+                "level": len(heading.group(1)),
+                "kind": "heading",
+                "title": _title(heading.group(2)),
+                "start": number,
+            })
+            block = None
+            continue
+
+        stamp = _TIMESTAMP.match(line)
+        if stamp:
+            hours, minutes, seconds = (int(g) if g else 0 for g in stamp.groups())
+            total = hours * 3600 + minutes * 60 + seconds
+            current = total // TIMESTAMP_BLOCK_SECONDS
+            if block != current:
+                block = current
+                start = current * TIMESTAMP_BLOCK_SECONDS
+                entries.append({
+                    "level": LEAF_LEVEL,
+                    "kind": "timestamp",
+                    "title": f"[{_format_seconds(start)}-{_format_seconds(start + TIMESTAMP_BLOCK_SECONDS)}]",
+                    "start": number,
+                })
+
+    for i, entry in enumerate(entries):
+        end = len(lines)
+        for following in entries[i + 1:]:
+            if following["level"] <= entry["level"]:
+                end = following["start"] - 1
+                break
+        entry["end"] = max(entry["start"], end)
+
+    return {"lines": len(lines), "entries": entries}
+
+
+def format_outline(outline: dict, display_name: str) -> str:
+    """Render an outline as a compact table of contents with line ranges."""
+    if not outline["entries"]:
+        return f"{display_name} ({outline['lines']} lines): no sections found"
+    rows = [f"{display_name} ({outline['lines']} lines)"]
+    section_level = CONTAINER_LEVEL
+    for entry in outline["entries"]:
+        if entry["level"] == LEAF_LEVEL:
+            depth = section_level + 1
+        else:
+            depth = section_level = entry["level"]
+        rows.append(f"L{entry['start']}-{entry['end']}\t{'  ' * depth}{entry['title']}")
+    return "\n".join(rows)
+
+
+def outline_path(user_id: str, subdirectory: str, rel_path: str) -> Path:
+    """Location of the precomputed outline for uploads/<user_id>/processed/<subdirectory>/<rel_path>.
+
+    Outlines live outside processed/ so they never show up in list_file or grep.
+    """
+    return BASE_DIR / user_id / "outlines" / subdirectory / f"{rel_path}.json"
+
+
+def write_outline(user_id: str, subdirectory: str, rel_path: str, markdown: str) -> Path:
+    """Compute and store the outline of a processed document."""
+    path = outline_path(user_id, subdirectory, rel_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(compute_outline(markdown)), encoding="utf-8")
+    return path
+
+
+def load_outline(user_id: str, subdirectory: str, rel_path: str, source: Path) -> dict:
+    """Return the stored outline for a document, recomputing it if missing or stale."""
+    path = outline_path(user_id, subdirectory, rel_path)
+    try:
+        if path.stat().st_mtime >= source.stat().st_mtime:
+            return json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        pass
+    return compute_outline(source.read_text(encoding="utf-8"))
+
+
+def backfill(user_id: str) -> int:
+    """Compute outlines for every processed document of a user that lacks an up-to-date one."""
+    processed = BASE_DIR / user_id / "processed"
+    count = 0
+    for file in processed.rglob("*.md"):
+        rel = file.relative_to(processed)
+        subdirectory, rel_path = rel.parts[0], str(Path(*rel.parts[1:]))
+        target = outline_path(user_id, subdirectory, rel_path)
+        if target.exists() and target.stat().st_mtime >= file.stat().st_mtime:
+            continue
+        write_outline(user_id, subdirectory, rel_path, file.read_text(encoding="utf-8"))
+        count += 1
+    return count
+
+
+if __name__ == "__main__":
+    # Backfill outlines for existing corpora: python outline.py <user_id> [<user_id> ...]
+    for user in sys.argv[1:]:
+        print(f"{user}: {backfill(user)} outlines written")
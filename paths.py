@@ -0,0 +1,4 @@
+from pathlib import Path
+
+# directory for storing user data (in uploads folder at project root)
+BASE_DIR = Path(__file__).parent / "uploads"
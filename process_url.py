@@ -1,16 +1,13 @@
+import os
 import re
-import time
-import random
 from urllib.parse import urlparse, urljoin
-import requests
-from bs4 import BeautifulSoup
-from readability import Document
-from github import Github
-from youtube_transcript_api import YouTubeTranscriptApi
-from markdownify import markdownify as md
-import trafilatura
-from trafilatura.settings import use_config
 
+# Converter dependencies (requests, bs4, markdownify, PyGithub,
+# youtube_transcript_api) are imported inside the function for the URL type
+# that needs them, so importing this module stays cheap.
+
+# GitHub REST API endpoint (override to point at GitHub Enterprise or a local stand-in)
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
 
 
 def detect_url_type(url):
@@ -33,31 +30,41 @@ def process_web_url(url, timeout=30):
         str: Markdown content or error message
     """
     try:
-        # Validate URL
-        parsed = urlparse(url)
-        if not parsed.scheme or not parsed.netloc:
-            return "Error: Invalid URL format"
-        
         # Get HTML content
-        html_content = fetch_with_requests(url, timeout)
+        html_content = fetch_web_html(url, timeout)
         
         if html_content.startswith("Error:"):
             return html_content
         
         # Convert HTML to markdown
-        markdown = html_to_markdown(html_content, url)
-        
-        if not markdown or len(markdown.strip()) < 50:
-            return "Error: Could not extract meaningful content from webpage"
-        
-        return markdown
+        return web_html_to_markdown(html_content, url)
     
     except Exception as e:
         return f"Error processing web URL: {type(e).__name__} - {str(e)}"
 
 
+def fetch_web_html(url, timeout=30):
+    """Validate a web URL and fetch its HTML (network-bound half of process_web_url)."""
+    parsed = urlparse(url)
+    if not parsed.scheme or not parsed.netloc:
+        return "Error: Invalid URL format"
+    return fetch_with_requests(url, timeout)
+
+
+def web_html_to_markdown(html, url):
+    """Convert fetched HTML to markdown (CPU-bound half of process_web_url)."""
+    markdown = html_to_markdown(html, url)
+    
+    if not markdown or len(markdown.strip()) < 50:
+        return "Error: Could not extract meaningful content from webpage"
+    
+    return markdown
+
+
 def fetch_with_requests(url, timeout=30):
     """Fetch HTML using requests with enhanced headers."""
+    import requests
+
     try:
         headers = {
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) '
@@ -83,6 +90,9 @@ def fetch_with_requests(url, timeout=30):
 
 def html_to_markdown(html, base_url=None):
     """Convert raw HTML to cleaned markdown."""
+    from bs4 import BeautifulSoup
+    from markdownify import markdownify as md
+
     try:
         soup = BeautifulSoup(html, "html.parser")
         
@@ -119,12 +129,14 @@ def get_repo_tree(repo, path="", depth=0, max_depth=2):
     return tree_md
     
 def process_github_url(url):
+    from github import Github
+
     try:
         # Extract user/repo
         parts = url.split("github.com/")[1].split("/")
         user, repo_name = parts[0], parts[1].replace('.git', '')
 
-        g = Github()  # unauthenticated (60 req/hr)
+        g = Github(base_url=GITHUB_API_URL)  # unauthenticated (60 req/hr)
         repo = g.get_repo(f"{user}/{repo_name}")
 
         markdown_output = f"# Repository: {user}/{repo_name}\n\n"
@@ -153,6 +165,8 @@ def process_github_url(url):
         return f"Error processing GitHub URL: {e}"
             
 def process_youtube_url(url):
+    from youtube_transcript_api import YouTubeTranscriptApi
+
     try:
         # Extract video ID
         video_id = None
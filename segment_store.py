@@ -0,0 +1,312 @@
+import argparse
+import fcntl
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+from outline import compute_outline
+from paths import BASE_DIR
+
+# "files" keeps loose markdown under processed/, "segments" packs it into
+# compressed segment files under uploads/<user_id>/segments/<subdirectory>/
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "files")
+
+SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+ZSTD_LEVEL = 3
+
+# Sealed segments are compacted once this fraction of their bytes is dead
+COMPACTION_GARBAGE_RATIO = 0.3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    path TEXT PRIMARY KEY,
+    segment INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    outline TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS docs_segment ON docs (segment);
+"""
+
+
+class SegmentStore:
+    """Append-only, zstd-compressed document store for one processed subdirectory.
+
+    Each document is an independent zstd frame appended to the active segment
+    file (seg-<n>.zst); a SQLite index maps its relative path to
+    (segment, offset, length) along with its precomputed outline. Rewriting a
+    path appends a new frame and leaves the old one as garbage until compact()
+    copies the live frames of mostly-dead segments into a fresh one.
+
+    Writers serialize on an flock; readers only need the index, so the
+    mcp_server processes can read while ingestion appends.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(root / "index.sqlite3", isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._compressor = None
+        self._decompressor = None
+
+    @classmethod
+    def open(cls, user_id: str, subdirectory: str) -> "SegmentStore":
+        return cls(BASE_DIR / user_id / "segments" / subdirectory)
+
+    def __enter__(self) -> "SegmentStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def _segment_path(self, segment: int) -> Path:
+        return self.root / f"seg-{segment:06d}.zst"
+
+    def _segments(self) -> list[int]:
+        return sorted(int(p.stem.split("-")[1]) for p in self.root.glob("seg-*.zst"))
+
+    @contextmanager
+    def _write_lock(self) -> Iterator[None]:
+        with open(self.root / ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _compress(self, data: bytes) -> bytes:
+        if self._compressor is None:
+            import zstandard
+
+            self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+        return self._compressor.compress(data)
+
+    def _decompress(self, data: bytes) -> bytes:
+        if self._decompressor is None:
+            import zstandard
+
+            self._decompressor = zstandard.ZstdDecompressor()
+        return self._decompressor.decompress(data)
+
+    def _append(self, frame: bytes, segment: int | None = None) -> tuple[int, int]:
+        """Append a frame to the active (or given) segment and return (segment, offset)."""
+        if segment is None:
+            segments = self._segments()
+            segment = segments[-1] if segments else 1
+            path = self._segment_path(segment)
+            if path.exists() and path.stat().st_size + len(frame) > SEGMENT_MAX_BYTES:
+                segment += 1
+        with open(self._segment_path(segment), "ab") as f:
+            offset = f.tell()
+            f.write(frame)
+            f.flush()
+            # Durable before the index points at it; a crash in between only leaves garbage
+            os.fsync(f.fileno())
+        return segment, offset
+
+    def put(self, path: str, text: str) -> None:
+        """Store (or replace) the document at a relative path."""
+        data = text.encode("utf-8")
+        frame = self._compress(data)
+        outline = json.dumps(compute_outline(text))
+        with self._write_lock():
+            segment, offset = self._append(frame)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO docs (path, segment, offset, length, size, outline, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (path, segment, offset, len(frame), len(data), outline, time.time()),
+            )
+
+    def delete(self, path: str) -> bool:
+        with self._write_lock():
+            return self._conn.execute("DELETE FROM docs WHERE path = ?", (path,)).rowcount > 0
+
+    def _read_frame(self, segment: int, offset: int, length: int) -> bytes:
+        with open(self._segment_path(segment), "rb") as f:
+            f.seek(offset)
+            return f.read(length)
+
+    def get(self, path: str) -> str | None:
+        """Return the document at a relative path, or None if it does not exist."""
+        for _ in range(2):
+            row = self._conn.execute("SELECT segment, offset, length FROM docs WHERE path = ?", (path,)).fetchone()
+            if row is None:
+                return None
+            try:
+                return self._decompress(self._read_frame(*row)).decode("utf-8")
+            except FileNotFoundError:
+                # The segment was compacted away between the lookup and the read; look up again
+                continue
+        raise FileNotFoundError(f"Segment for '{path}' disappeared during compaction")
+
+    def outline(self, path: str) -> dict | None:
+        row = self._conn.execute("SELECT outline FROM docs WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]) if row[0] else compute_outline(self.get(path) or "")
+
+    def exists(self, path: str) -> bool:
+        return self._conn.execute("SELECT 1 FROM docs WHERE path = ?", (path,)).fetchone() is not None
+
+    def paths(self, prefix: str = "") -> list[str]:
+        """All document paths under a directory prefix, sorted."""
+        if not prefix:
+            return [r[0] for r in self._conn.execute("SELECT path FROM docs ORDER BY path")]
+        prefix = prefix.rstrip("/") + "/"
+        return [
+            r[0] for r in self._conn.execute(
+                "SELECT path FROM docs WHERE substr(path, 1, ?) = ? ORDER BY path", (len(prefix), prefix)
+            )
+        ]
+
+    def list_dir(self, prefix: str = "") -> list[tuple[str, bool]] | None:
+        """Immediate children of a directory as (name, is_dir), or None if the directory does not exist."""
+        paths = self.paths(prefix)
+        if prefix and not paths:
+            return None
+        start = len(prefix.rstrip("/") + "/") if prefix else 0
+        children: dict[str, bool] = {}
+        for path in paths:
+            name, _, rest = path[start:].partition("/")
+            children[name] = children.get(name, False) or bool(rest)
+        return sorted(children.items())
+
+    def iter_documents(self, prefix: str = "") -> Iterator[tuple[str, str]]:
+        """Yield (path, text) for every document under a prefix in path order, decompressing lazily."""
+        rows = self._conn.execute("SELECT path, segment, offset, length FROM docs ORDER BY path").fetchall()
+        if prefix:
+            wanted = prefix.rstrip("/") + "/"
+            rows = [r for r in rows if r[0].startswith(wanted)]
+        for path, segment, offset, length in rows:
+            try:
+                yield path, self._decompress(self._read_frame(segment, offset, length)).decode("utf-8")
+            except FileNotFoundError:
+                text = self.get(path)
+                if text is not None:
+                    yield path, text
+
+    def compact(self, force: bool = False) -> int:
+        """Rewrite sealed segments whose dead fraction exceeds COMPACTION_GARBAGE_RATIO.
+
+        Live frames are copied as-is (no recompression) into a new segment, the
+        index is switched over in one transaction, then the old segments are
+        removed.
+
+        Args:
+            force: Also compact the active segment and ignore the garbage threshold
+
+        Returns:
+            Number of bytes reclaimed
+        """
+        with self._write_lock():
+            segments = self._segments()
+            if not segments:
+                return 0
+            live = dict(self._conn.execute("SELECT segment, SUM(length) FROM docs GROUP BY segment").fetchall())
+            candidates = []
+            for segment in segments if force else segments[:-1]:
+                size = self._segment_path(segment).stat().st_size
+                dead = size - live.get(segment, 0)
+                if size and (force or dead / size > COMPACTION_GARBAGE_RATIO):
+                    candidates.append((segment, size))
+            if not candidates:
+                return 0
+
+            target = segments[-1] + 1
+            moves = []
+            moved_bytes = 0
+            for segment, _ in candidates:
+                rows = self._conn.execute(
+                    "SELECT path, offset, length FROM docs WHERE segment = ? ORDER BY offset", (segment,)
+                ).fetchall()
+                for path, offset, length in rows:
+                    frame = self._read_frame(segment, offset, length)
+                    if self._segment_path(target).exists() and \
+                            self._segment_path(target).stat().st_size + length > SEGMENT_MAX_BYTES:
+                        target += 1
+                    new_segment, new_offset = self._append(frame, target)
+                    moves.append((new_segment, new_offset, path, segment))
+                    moved_bytes += length
+
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.executemany(
+                "UPDATE docs SET segment = ?, offset = ? WHERE path = ? AND segment = ?", moves
+            )
+            self._conn.execute("COMMIT")
+
+            for segment, _ in candidates:
+                self._segment_path(segment).unlink()
+            return sum(size for _, size in candidates) - moved_bytes
+
+
+def compact_all() -> int:
+    """Compact every user's segment stores; returns total bytes reclaimed."""
+    reclaimed = 0
+    for root in BASE_DIR.glob("*/segments/*"):
+        if root.is_dir():
+            with SegmentStore(root) as store:
+                reclaimed += store.compact()
+    return reclaimed
+
+
+def migrate(user_id: str, delete: bool = False) -> int:
+    """Pack a user's existing processed/{links,docs,media} files into segment stores.
+
+    Each document is read back and compared before its original is removed
+    (only with delete=True). Outline sidecars under outlines/ are dropped
+    along with the originals, since the segment index stores outlines itself.
+
+    Returns:
+        Number of documents migrated
+    """
+    processed = BASE_DIR / user_id / "processed"
+    count = 0
+    for subdir in sorted(p for p in processed.iterdir() if p.is_dir()) if processed.exists() else []:
+        with SegmentStore.open(user_id, subdir.name) as store:
+            for file in sorted(f for f in subdir.rglob("*") if f.is_file() and not f.name.startswith(".")):
+                rel_path = file.relative_to(subdir).as_posix()
+                try:
+                    text = file.read_text(encoding="utf-8")
+                except UnicodeDecodeError:
+                    continue
+                store.put(rel_path, text)
+                if store.get(rel_path) != text:
+                    raise RuntimeError(f"Verification failed for {file}")
+                if delete:
+                    file.unlink()
+                    sidecar = BASE_DIR / user_id / "outlines" / subdir.name / f"{rel_path}.json"
+                    sidecar.unlink(missing_ok=True)
+                count += 1
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage segment-packed processed corpora")
+    commands = parser.add_subparsers(dest="command", required=True)
+    migrate_cmd = commands.add_parser("migrate", help="Pack existing processed/ directories into segments")
+    migrate_cmd.add_argument("user_ids", nargs="+")
+    migrate_cmd.add_argument("--delete", action="store_true", help="Remove loose files after verifying them")
+    compact_cmd = commands.add_parser("compact", help="Compact segment stores")
+    compact_cmd.add_argument("user_ids", nargs="*", help="Users to compact (default: all)")
+    compact_cmd.add_argument("--force", action="store_true")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        for user in args.user_ids:
+            print(f"{user}: {migrate(user, args.delete)} documents migrated")
+    else:
+        pattern = [BASE_DIR / u / "segments" for u in args.user_ids] if args.user_ids else list(BASE_DIR.glob("*/segments"))
+        for root in (r for base in pattern for r in base.glob("*") if r.is_dir()):
+            with SegmentStore(root) as store:
+                print(f"{root}: {store.compact(force=args.force)} bytes reclaimed")
@@ -0,0 +1,125 @@
+import contextvars
+import json
+import logging
+import os
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+from prometheus_client import Counter, Histogram
+
+# Structured span records go to their own logger so they can be routed or
+# silenced independently of the application logs.
+span_logger = logging.getLogger("helix.trace")
+
+# Fraction of tool payloads / model messages logged at INFO when DEBUG is off.
+PAYLOAD_LOG_SAMPLE_RATE = float(os.getenv("PAYLOAD_LOG_SAMPLE_RATE", "0"))
+
+STAGE_LATENCY = Histogram(
+    "helix_stage_duration_seconds",
+    "Latency of each search pipeline stage",
+    ["stage", "agent"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600),
+)
+
+LLM_TOKENS = Counter(
+    "helix_llm_tokens_total",
+    "Tokens consumed by LLM calls",
+    ["agent", "kind"],
+)
+
+TOOL_OUTPUT_BYTES = Histogram(
+    "helix_tool_output_bytes",
+    "Size of tool call payloads returned to the model",
+    ["tool"],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+)
+
+_trace_id: contextvars.ContextVar[str] = contextvars.ContextVar("helix_trace_id", default="-")
+
+
+def new_trace() -> str:
+    """Start a new trace for the current request and return its id.
+
+    The id lives in a context variable, so tasks spawned by asyncio.gather
+    inherit it and their spans are correlated with the request.
+    """
+    trace_id = uuid.uuid4().hex[:16]
+    _trace_id.set(trace_id)
+    return trace_id
+
+
+def current_trace_id() -> str:
+    """Return the trace id of the current request, or '-' outside a trace."""
+    return _trace_id.get()
+
+
+@contextmanager
+def span(stage: str, agent: str = "", **attributes) -> Iterator[dict]:
+    """Time a pipeline stage and emit it as a structured span.
+
+    The yielded dict can be updated with extra attributes (token counts,
+    output sizes, ...) before the block exits. On exit the duration is
+    observed in the per-stage latency histogram and the span is logged as a
+    single JSON line on the ``helix.trace`` logger.
+
+    Args:
+        stage: Stage name (request, queue, mcp_startup, llm_call, tool_call, synthesis, ...)
+        agent: Agent subdirectory the stage belongs to, empty for request-level stages
+        **attributes: Initial span attributes
+    """
+    record = {"trace_id": _trace_id.get(), "span": stage, "agent": agent, **attributes}
+    start = time.perf_counter()
+    try:
+        yield record
+    except BaseException as e:
+        record["error"] = type(e).__name__
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        STAGE_LATENCY.labels(stage=stage, agent=agent or "-").observe(duration)
+        record["duration_ms"] = round(duration * 1000, 2)
+        if span_logger.isEnabledFor(logging.INFO):
+            span_logger.info(json.dumps(record, default=str))
+
+
+def record_usage(record: dict, usage: object) -> None:
+    """Attach token usage from a chat completion to a span and count it.
+
+    Args:
+        record: Span record yielded by span()
+        usage: The ``usage`` attribute of a chat completion response (may be None)
+    """
+    if usage is None:
+        return
+    agent = record.get("agent") or "-"
+    for kind in ("prompt_tokens", "completion_tokens"):
+        count = getattr(usage, kind, None)
+        if isinstance(count, int):
+            record[kind] = count
+            LLM_TOKENS.labels(agent=agent, kind=kind.removesuffix("_tokens")).inc(count)
+
+
+def record_tool_output(record: dict, tool: str, payload: str) -> None:
+    """Attach the size of a tool payload to a span and observe it."""
+    size = len(payload.encode("utf-8"))
+    record["output_bytes"] = size
+    TOOL_OUTPUT_BYTES.labels(tool=tool).observe(size)
+
+
+def log_payload(log: logging.Logger, build: Callable[[], str]) -> None:
+    """Log a potentially large payload without paying for it on the hot path.
+
+    The message is only built when DEBUG is enabled for ``log``, or for a
+    PAYLOAD_LOG_SAMPLE_RATE fraction of calls (logged at INFO).
+
+    Args:
+        log: Logger to write to
+        build: Callable returning the message; only invoked if it will be logged
+    """
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug(build())
+    elif PAYLOAD_LOG_SAMPLE_RATE > 0 and random.random() < PAYLOAD_LOG_SAMPLE_RATE:
+        log.info(build())
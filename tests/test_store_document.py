@@ -0,0 +1,113 @@
+import multiprocessing
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import dedup
+import ingest_queue
+import outline
+import segment_store
+from dedup import DedupIndex
+from ingest_queue import load_markdown, output_name, store_document
+
+ARTICLE = (
+    "Vector databases index embeddings so that nearest neighbour queries stay fast as the corpus grows. "
+    "Approximate methods such as HNSW trade a little recall for large speedups, and product quantization "
+    "shrinks the memory footprint of every stored vector considerably."
+)
+ARTICLE_COPY = ARTICLE + " Shared from a mirror."
+UNRELATED = (
+    "Sourdough starters need regular feeding with flour and water, and a warm kitchen speeds up fermentation. "
+    "Bakers fold the dough several times during bulk proofing before shaping and a long cold retard overnight."
+)
+
+
+class StoreDocumentTest(unittest.TestCase):
+    """store_document keeps linked duplicates backed by a stored copy when their canonical changes."""
+
+    backend = "files"
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        base = Path(tmp.name)
+        for module in (ingest_queue, dedup, outline, segment_store):
+            patcher = mock.patch.object(module, "BASE_DIR", base)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        for patcher in (
+            mock.patch.object(ingest_queue, "STORAGE_BACKEND", self.backend),
+            mock.patch.object(ingest_queue, "DEDUP_MODE", "link"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def stored(self, url: str) -> str | None:
+        return load_markdown("u1", "links", output_name("url", url))
+
+    def clusters(self) -> dict[str, list[str]]:
+        with DedupIndex("u1") as index:
+            return {c["canonical"]: [d["path"] for d in c["duplicates"]] for c in index.clusters()}
+
+    def test_canonical_replaced_with_unique_content_hands_off_to_duplicate(self):
+        store_document("u1", "url", "https://x.com/p", ARTICLE)
+        _, duplicate = store_document("u1", "url", "https://y.com/h", ARTICLE_COPY)
+        self.assertTrue(duplicate)
+
+        _, duplicate = store_document("u1", "url", "https://x.com/p", UNRELATED)
+
+        self.assertFalse(duplicate)
+        self.assertEqual(self.stored("https://x.com/p"), UNRELATED)
+        # y.com/h only had a link to x.com/p; the article now lives under its own path
+        self.assertEqual(self.stored("https://y.com/h"), ARTICLE)
+        self.assertEqual(self.clusters(), {})
+
+    def test_canonical_replaced_with_similar_content_keeps_duplicates_linked(self):
+        x = f"links/{output_name('url', 'https://x.com/p')}"
+        store_document("u1", "url", "https://x.com/p", ARTICLE)
+        store_document("u1", "url", "https://y.com/h", ARTICLE_COPY)
+
+        store_document("u1", "url", "https://x.com/p", ARTICLE + " Updated.")
+
+        self.assertIsNone(self.stored("https://y.com/h"))
+        self.assertEqual(self.clusters(), {x: [f"links/{output_name('url', 'https://y.com/h')}"]})
+
+    def test_canonical_becoming_duplicate_is_removed_and_duplicates_rehomed(self):
+        z = f"links/{output_name('url', 'https://z.com/u')}"
+        store_document("u1", "url", "https://x.com/p", ARTICLE)
+        store_document("u1", "url", "https://z.com/u", UNRELATED)
+        store_document("u1", "url", "https://y.com/h", ARTICLE_COPY)
+
+        path, duplicate = store_document("u1", "url", "https://x.com/p", UNRELATED)
+
+        self.assertTrue(duplicate)
+        self.assertEqual(path.name, z.split("/", 1)[1])
+        self.assertIsNone(self.stored("https://x.com/p"))
+        self.assertEqual(self.stored("https://y.com/h"), ARTICLE)
+        self.assertEqual(self.clusters(), {z: [f"links/{output_name('url', 'https://x.com/p')}"]})
+
+
+class SegmentStoreDocumentTest(StoreDocumentTest):
+    backend = "segments"
+
+
+def _store_copy(base: str, url: str) -> bool:
+    with mock.patch.object(ingest_queue, "BASE_DIR", Path(base)), mock.patch.object(dedup, "BASE_DIR", Path(base)), \
+            mock.patch.object(outline, "BASE_DIR", Path(base)), mock.patch.object(ingest_queue, "DEDUP_MODE", "link"), \
+            mock.patch.object(ingest_queue, "STORAGE_BACKEND", "files"):
+        return store_document("u1", "url", url, ARTICLE)[1]
+
+
+class ConcurrentStoreTest(unittest.TestCase):
+    def test_copies_stored_from_several_processes_are_deduplicated(self):
+        with tempfile.TemporaryDirectory() as base:
+            urls = [f"https://mirror{n}.example/article" for n in range(8)]
+            with multiprocessing.get_context("spawn").Pool(4) as pool:
+                duplicates = pool.starmap(_store_copy, [(base, url) for url in urls])
+            self.assertEqual(duplicates.count(False), 1)
+            self.assertEqual(len(list((Path(base) / "u1" / "processed" / "links").iterdir())), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()